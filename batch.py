@@ -0,0 +1,176 @@
+import argparse, csv, json, os, logging
+from time import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from qc_scheduling import QCScheduling
+from branch_and_bound import branch_and_bound_dfs
+from grasp import launch
+
+# Instances are read from a directory of .json and .csv files, one vessel
+# per file. Tasks are numbered from 1 in file order, bays and QC positions
+# are ship-bay numbers as in main.py.
+#
+# JSON: {"durations": [8, 10, ...], "bays": [1, 2, ...], "qcs": [1, 4],
+#        "psi": [[1, 2], ...], "phi": [[3, 5], ...]}
+# CSV, one keyed row per entry:
+#   task,<duration>,<bay>
+#   qc,<bay>
+#   psi,<task i>,<task j>
+#   phi,<task i>,<task j>
+
+SOLVERS = ('grasp', 'branch_and_bound')
+# Share of an instance's time limit GRASP gets when branch and bound follows
+GRASP_SHARE = 0.5
+RESULT_FIELDS = ['instance', 'solver', 'tasks', 'qcs', 'status', 'makespan', 'objective', 'run_time', 'lp_solves', 'error']
+
+logger = logging.getLogger()
+
+def load_instance(path):
+    if path.endswith('.json'):
+        with open(path) as f:
+            data = json.load(f)
+    elif path.endswith('.csv'):
+        data = read_csv_instance(path)
+    else:
+        raise ValueError(f'Unknown instance format: {path}')
+    return build_instance(data, path)
+
+def build_instance(data, name='instance'):
+    # data as read from a JSON instance
+    durations, bays, qcs = data['durations'], data['bays'], data['qcs']
+    if len(durations) != len(bays):
+        raise ValueError(f'{name}: {len(durations)} durations for {len(bays)} bays')
+    psi = {tuple(pair) for pair in data.get('psi', [])}
+    phi = {tuple(pair) for pair in data.get('phi', [])}
+    return QCScheduling(len(durations), len(qcs), durations, bays, qcs, psi, phi)
+
+def read_csv_instance(path):
+    data = {'durations': [], 'bays': [], 'qcs': [], 'psi': [], 'phi': []}
+    with open(path, newline='') as f:
+        for line, row in enumerate(csv.reader(f), 1):
+            row = [cell.strip() for cell in row]
+            if not row or not row[0] or row[0].startswith('#'):
+                continue
+            key, values = row[0].lower(), [int(cell) for cell in row[1:] if cell]
+            if key == 'task' and len(values) == 2:
+                data['durations'].append(values[0])
+                data['bays'].append(values[1])
+            elif key == 'qc' and len(values) == 1:
+                data['qcs'].append(values[0])
+            elif key in ('psi', 'phi') and len(values) == 2:
+                data[key].append(values)
+            else:
+                raise ValueError(f'{path}:{line}: cannot read row {row}')
+    return data
+
+def list_instances(dirname):
+    return sorted(
+        os.path.join(dirname, name) for name in os.listdir(dirname)
+        if name.endswith('.json') or name.endswith('.csv')
+    )
+
+def instance_name(path):
+    return os.path.splitext(os.path.basename(path))[0]
+
+def solve_instance(path, output, solvers, time_limit, alpha, early_stop):
+    # Runs in a worker process: solves one instance with each solver, the
+    # log and the solutions go to output/<instance> as main.process does.
+    # GRASP runs first so that branch and bound starts from its solution.
+    # time_limit is the budget of the instance: GRASP gets GRASP_SHARE of it
+    # when branch and bound follows, branch and bound what GRASP left.
+    name = instance_name(path)
+    dirpath = os.path.join(output, name)
+    if not os.path.exists(dirpath):
+        os.makedirs(dirpath)
+    handler = logging.FileHandler(os.path.join(dirpath, 'output.log'), mode='w')
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    handlers, level = logger.handlers, logger.level
+    logger.handlers = [handler]
+    logger.setLevel(logging.INFO)
+
+    rows = []
+    try:
+        start_time = time()
+        qcs = load_instance(path)
+        incumbent = None
+        for solver in SOLVERS:
+            if solver not in solvers:
+                continue
+            row = {'instance': name, 'solver': solver, 'tasks': qcs.num_tasks, 'qcs': qcs.num_qcs}
+            try:
+                deadline = max(0, time_limit - (time() - start_time))
+                if solver == 'grasp' and 'branch_and_bound' in solvers:
+                    deadline *= GRASP_SHARE
+                if solver == 'grasp':
+                    solution, run_time, stats = launch(qcs, alpha, early_stop, deadline=deadline)
+                    incumbent = solution
+                else:
+                    solution, run_time, stats = branch_and_bound_dfs(qcs, deadline=deadline, incumbent=incumbent)
+                row['run_time'] = run_time
+                row['lp_solves'] = stats['lp_solve']
+                stats.toJSON(os.path.join(dirpath, f'{solver}_stats.json'))
+                if solution is None:
+                    row['status'] = 'No solution found'
+                else:
+                    row['status'] = solution.solve()
+                    row['makespan'] = solution.objective()
+                    row['objective'] = solution.lpObjective()
+                    qcs.export(solution.lpModel, solver, dirpath)
+            except Exception as e:
+                logger.exception('%s failed on %s', solver, path)
+                row['error'] = repr(e)
+            rows.append(row)
+    except Exception as e:
+        logger.exception('Cannot load %s', path)
+        rows.append({'instance': name, 'error': repr(e)})
+    finally:
+        logger.handlers = handlers
+        logger.setLevel(level)
+        handler.close()
+    return rows
+
+def run_batch(dirname, output, solvers=SOLVERS, workers=None, time_limit=60, alpha=0.4, early_stop=50):
+    paths = list_instances(dirname)
+    logger.info('Batch of %d instances from %s', len(paths), dirname)
+    rows = []
+    with ProcessPoolExecutor(workers or os.cpu_count()) as executor:
+        futures = {
+            executor.submit(solve_instance, path, output, solvers, time_limit, alpha, early_stop): path
+            for path in paths
+        }
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                # The worker process itself died
+                result = [{'instance': instance_name(futures[future]), 'error': repr(e)}]
+            for row in result:
+                logger.info('%s %s: %s %s', row['instance'], row.get('solver', ''), row.get('makespan'), row.get('error') or '')
+            rows.extend(result)
+
+    rows.sort(key=lambda row: (row['instance'], row.get('solver', '')))
+    if not os.path.exists(output):
+        os.makedirs(output)
+    with open(os.path.join(output, 'results.csv'), 'w', newline='') as f:
+        writer = csv.DictWriter(f, RESULT_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Solve every instance of a directory')
+    parser.add_argument('input', help='directory of .json/.csv instances')
+    parser.add_argument('-o', '--output', default=os.path.join('output', 'batch'))
+    parser.add_argument('-w', '--workers', type=int, default=None)
+    parser.add_argument('-t', '--time-limit', type=float, default=60, help='seconds per instance, shared by its solvers')
+    parser.add_argument('-s', '--solvers', nargs='+', choices=SOLVERS, default=list(SOLVERS))
+    parser.add_argument('--alpha', type=float, default=0.4)
+    parser.add_argument('--early-stop', type=int, default=50)
+    args = parser.parse_args()
+
+    logging.basicConfig(format='%(message)s', level=logging.INFO)
+    run_batch(args.input, args.output, args.solvers, args.workers, args.time_limit, args.alpha, args.early_stop)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+from time import time
+import logging
+import util
+import metrics
+from branch_and_bound import branch, initial_incumbent, notify, TIME_LIMIT
+
+BEAM_WIDTH = 50
+
+logger = logging.getLogger()
+
+def beam_search(qcs, width=BEAM_WIDTH, widen=2, restarts=0, deadline=TIME_LIMIT, on_improvement=None, incumbent=None, stats=None):
+    # Breadth-first over the levels of the search tree (one more task
+    # assigned per level), keeping the width children with the lowest
+    # bounds that pass qcs.evaluateNode. Children are generated and bounded
+    # as in branch and bound and evaluated in bound order until the beam is
+    # full, so a pass holds at most width states per level. Each restart
+    # runs a new pass with the beam widened by widen, pruning with the best
+    # solution so far. A pass that never drops a child is complete and
+    # proves its solution optimal.
+    # Other arguments and result as in branch_and_bound_dfs.
+    logger.info('Beam search---------------------')
+    stats = metrics.SolverStats('beam_search') if stats is None else stats
+    with metrics.collecting(stats):
+        start_time = time()
+        solution, objective = initial_incumbent(qcs, incumbent)
+        start_bound = qcs.computeLowBound(qcs.getStartState(False))
+        complete = False
+        count = 0
+
+        for attempt in range(restarts + 1):
+            if time() - start_time >= deadline:
+                break
+            if attempt:
+                width *= widen
+            logger.info('Beam pass %d with width %d', attempt, width)
+            stats.count('passes')
+            dominance = util.DominanceTable()
+            start_node = qcs.getStartState()
+            if solution is not None:
+                qcs.addObjectiveUpBound(start_node, objective / qcs.ALPHA1)
+            dominance.insert(start_node.mask, start_node.qc_completion_time)
+            beam = [start_node] if qcs.evaluateNode(start_node)[0] == 'Optimal' else []
+            pruned = False
+
+            while beam:
+                if time() - start_time >= deadline:
+                    logger.info('Time limit exceeded')
+                    pruned = True
+                    break
+                stats.gauge('beam', len(beam))
+                explored = set()
+                children = []
+                for node in beam:
+                    children.extend(branch(qcs, node, explored, objective, dominance))
+                # Children dominated by a sibling generated after them
+                children = [(child, bound) for child, bound in children if dominance.contains(child.mask, child.qc_completion_time)]
+                children.sort(key=lambda child: (child[1], child[0].objective()))
+
+                # Evaluated in bound order until the beam is full
+                beam = []
+                for rank, (child, _) in enumerate(children):
+                    if len(beam) == width:
+                        stats.count('pruned_beam', len(children) - rank)
+                        pruned = True
+                        break
+                    count += 1
+                    status, child_objective = qcs.evaluateNode(child)
+                    if status != 'Optimal':
+                        stats.count('pruned_infeasible')
+                    elif objective <= child_objective:
+                        stats.count('pruned_bound')
+                    elif qcs.isGoalState(child):
+                        objective = child_objective
+                        solution = child
+                        stats.count('improvements')
+                        logger.info('(ITERATION %d) New solution found: %s', count, child.objective())
+                        logger.info('%s', solution)
+                        # Optimality is only known once the pass is over
+                        if on_improvement is not None:
+                            notify(on_improvement, solution, objective, start_time, start_bound)
+                    else:
+                        beam.append(child)
+
+            complete = not pruned
+            if complete:
+                logger.info('Beam pass %d was complete', attempt)
+                break
+
+    stats.set('nodes', count)
+    stats.set('width', width)
+    stats.set('objective', objective)
+    stats.set('optimal', complete)
+    stats.set('solve_cache', qcs.solve_cache.stats())
+    stats.set('best_bound', objective if complete else min(objective, start_bound))
+    run_time = stats.stop()
+    logger.info('Done in %s(s) with %d(iters)', run_time, count)
+    logger.info('%s', stats)
+    return solution, run_time, stats
@@ -0,0 +1,216 @@
+import argparse, json, math, os, platform, random, subprocess
+import numpy as np
+from time import time
+import util
+from batch import build_instance
+from branch_and_bound import branch_and_bound_dfs
+from grasp import launch
+
+# Instances in the style of Kim & Park (2004): tasks are grouped by ship
+# bay, the tasks of a bay are processed in a fixed order (discharging before
+# loading) and two QCs cannot work in the same or in adjacent bays at the
+# same time. Size classes are (tasks, QCs).
+SIZE_CLASSES = {
+    'A': (10, 2),
+    'B': (15, 2),
+    'C': (20, 3),
+    'D': (25, 3),
+    'E': (30, 4),
+    'F': (35, 4),
+    'G': (40, 5),
+    'H': (45, 5),
+    'I': (50, 6),
+}
+TASKS_PER_BAY = 2.5
+DURATIONS = (20, 400)
+PHI_DENSITY = 0.5   # probability that consecutive tasks of a bay are ordered
+PSI_DENSITY = 0.3   # probability that tasks of adjacent bays are non-simultaneous
+
+SOLVERS = ('branch_and_bound', 'grasp')
+
+
+def generate_instance(size_class, seed, phi_density=PHI_DENSITY, psi_density=PSI_DENSITY):
+    # Instance as read by batch.build_instance, the same (class, seed) always
+    # gives the same instance
+    num_tasks, num_qcs = SIZE_CLASSES[size_class]
+    rng = random.Random(f'{size_class}-{seed}')
+    num_bays = max(num_qcs, math.ceil(num_tasks / TASKS_PER_BAY))
+
+    # Every bay gets a task, tasks are numbered in bay order
+    bays = sorted(list(range(1, num_bays + 1)) + [rng.randint(1, num_bays) for _ in range(num_tasks - num_bays)])
+    durations = [rng.randint(*DURATIONS) for _ in range(num_tasks)]
+    # QCs evenly spread over the ship, each one reaches its share of bays
+    qcs = [1 + int(num_bays * (qc + 0.5) / num_qcs) for qc in range(num_qcs)]
+
+    phi, psi = [], []
+    for i in range(1, num_tasks + 1):
+        for j in range(i + 1, num_tasks + 1):
+            distance = bays[j - 1] - bays[i - 1]
+            if distance == 0:
+                # Tasks of a bay never overlap, some of them in a given order
+                if j == i + 1 and rng.random() < phi_density:
+                    phi.append([i, j])
+                else:
+                    psi.append([i, j])
+            elif distance == 1 and rng.random() < psi_density:
+                psi.append([i, j])
+
+    return {'durations': durations, 'bays': bays, 'qcs': qcs, 'psi': psi, 'phi': phi}
+
+def generate_suite(classes, seeds):
+    return [(f'{size_class}{seed}', size_class, seed, generate_instance(size_class, seed)) for size_class in classes for seed in seeds]
+
+
+def run_solver(qcs, solver, time_limit, alpha, early_stop, grasp_seed):
+    # One timed run, returns the solution with the solver's statistics
+    improvements = []
+    start_time = time()
+    if solver == 'branch_and_bound':
+        solution, _, stats = branch_and_bound_dfs(qcs, deadline=time_limit, on_improvement=improvements.append)
+    else:
+        # launch draws from the global generators
+        random.seed(grasp_seed)
+        np.random.seed(grasp_seed)
+        solution, _, stats = launch(qcs, alpha, early_stop, deadline=time_limit, on_improvement=improvements.append)
+    stats.set('wall_time', time() - start_time)
+    return solution, stats, improvements
+
+def benchmark_instance(name, size_class, seed, data, solvers, time_limit, alpha, early_stop):
+    # Each solver gets its own time_limit
+    qcs = build_instance(data, name)
+    records = []
+    trajectories = []
+    for solver in solvers:
+        solution, stats, improvements = run_solver(qcs, solver, time_limit, alpha, early_stop, seed)
+        nodes, iterations = stats.values.get('nodes'), stats.values.get('iterations')
+        record = {
+            'instance': name, 'class': size_class, 'seed': seed, 'solver': solver,
+            'tasks': qcs.num_tasks, 'qcs': qcs.num_qcs,
+            'wall_time': stats['wall_time'],
+            'nodes': nodes, 'iterations': iterations,
+            'per_second': (nodes or iterations or 0) / stats['wall_time'] if stats['wall_time'] > 0 else None,
+            'lp_solves': stats['lp_solve'],
+            'improvements': len(improvements),
+            'makespan': None, 'objective': None, 'gap': None, 'time_to_target': None,
+        }
+        if solution is not None:
+            record['makespan'] = solution.objective()
+            # Branch and bound works on the MILP objective, GRASP on the makespan
+            record['objective'] = solution.lpObjective() if solver == 'branch_and_bound' else solution.objective()
+            record['gap'] = util.relativeGap(record['objective'], stats['best_bound'])
+        # Improvements of both solvers are compared on the makespan
+        trajectories.append([(improvement.elapsed, qcs.getScheduleState(improvement.schedule, False).objective()) for improvement in improvements])
+        record['stats'] = stats.toDict()
+        records.append(record)
+
+    # Time to target: first time a solver reaches the best makespan found on
+    # the instance by any solver
+    target = min((record['makespan'] for record in records if record['makespan'] is not None), default=None)
+    for record, trajectory in zip(records, trajectories):
+        record['target'] = target
+        record['time_to_target'] = next((elapsed for elapsed, makespan in trajectory if makespan <= target), None) if target is not None else None
+    return records
+
+def summarize(records):
+    # Per (class, solver): runs, solved runs and mean measures over them
+    groups = {}
+    for record in records:
+        groups.setdefault(f"{record['class']}/{record['solver']}", []).append(record)
+    summary = {}
+    for key, group in sorted(groups.items()):
+        solved = [record for record in group if record['makespan'] is not None]
+        summary[key] = {
+            'runs': len(group),
+            'solved': len(solved),
+            'mean_wall_time': sum(record['wall_time'] for record in group) / len(group),
+            'mean_per_second': mean([record['per_second'] for record in group]),
+            'mean_lp_solves': mean([record['lp_solves'] for record in group]),
+            'mean_gap': mean([record['gap'] for record in solved]),
+            'mean_makespan': mean([record['makespan'] for record in solved]),
+        }
+    return summary
+
+def mean(values):
+    values = [v for v in values if v is not None]
+    return sum(values) / len(values) if values else None
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_benchmark(classes, seeds, solvers=SOLVERS, time_limit=60, alpha=0.4, early_stop=50):
+    records = []
+    for name, size_class, seed, data in generate_suite(classes, seeds):
+        for record in benchmark_instance(name, size_class, seed, data, solvers, time_limit, alpha, early_stop):
+            print(f"{record['instance']:>5} {record['solver']:>16}: makespan {record['makespan']} "
+                  f"in {record['wall_time']:.2f}s, gap {record['gap']}, target after {record['time_to_target']}")
+            records.append(record)
+    return {
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'settings': {'classes': list(classes), 'seeds': list(seeds), 'solvers': list(solvers),
+                     'time_limit': time_limit, 'alpha': alpha, 'early_stop': early_stop},
+        'summary': summarize(records),
+        'records': records,
+    }
+
+def compare(base, new):
+    # Ratios new / base of the summary measures, per (class, solver)
+    result = {}
+    for key, new_group in new['summary'].items():
+        base_group = base['summary'].get(key)
+        if base_group is None:
+            continue
+        result[key] = {
+            measure: new_group[measure] / base_group[measure] if new_group[measure] is not None and base_group[measure] else None
+            for measure in ('mean_wall_time', 'mean_per_second', 'mean_lp_solves', 'mean_makespan')
+        }
+        result[key]['solved'] = f"{base_group['solved']} -> {new_group['solved']}"
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the solvers on generated Kim & Park style instances')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run = commands.add_parser('run', help='run the benchmark and write the results as JSON')
+    run.add_argument('-c', '--classes', nargs='+', choices=SIZE_CLASSES, default=['A', 'B'])
+    run.add_argument('-n', '--seeds', type=int, default=3, help='instances per class')
+    run.add_argument('-s', '--solvers', nargs='+', choices=SOLVERS, default=list(SOLVERS))
+    run.add_argument('-t', '--time-limit', type=float, default=60, help='seconds per solver and instance')
+    run.add_argument('--alpha', type=float, default=0.4)
+    run.add_argument('--early-stop', type=int, default=50)
+    run.add_argument('-o', '--output', default='benchmark.json')
+
+    generate = commands.add_parser('generate', help='write the instances as JSON files for batch.py')
+    generate.add_argument('-c', '--classes', nargs='+', choices=SIZE_CLASSES, default=list(SIZE_CLASSES))
+    generate.add_argument('-n', '--seeds', type=int, default=3)
+    generate.add_argument('-o', '--output', default='instances')
+
+    diff = commands.add_parser('compare', help='compare two benchmark results')
+    diff.add_argument('base')
+    diff.add_argument('new')
+
+    args = parser.parse_args()
+    if args.command == 'run':
+        result = run_benchmark(args.classes, range(args.seeds), args.solvers, args.time_limit, args.alpha, args.early_stop)
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2)
+    elif args.command == 'generate':
+        if not os.path.exists(args.output):
+            os.makedirs(args.output)
+        for name, _, _, data in generate_suite(args.classes, range(args.seeds)):
+            with open(os.path.join(args.output, f'{name}.json'), 'w') as f:
+                json.dump(data, f)
+    else:
+        with open(args.base) as f:
+            base = json.load(f)
+        with open(args.new) as f:
+            new = json.load(f)
+        print(json.dumps(compare(base, new), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,80 +1,327 @@
 from time import time
 from pulp import *
 from search import *
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+import multiprocessing
+import os
+import json
+import contextlib
 import util
+import metrics
 import logging
 
 TIME_LIMIT = 10800 # 3 hours
+TRAVERSALS = ('best', 'dfs', 'dive')
+# Nodes between two dives of the 'dive' traversal once there is an incumbent
+DIVE_INTERVAL = 100
 
 logger = logging.getLogger()
 
-def branch_and_bound_dfs(qcs):
+def branch_and_bound_dfs(qcs, deadline=TIME_LIMIT, max_nodes=None, on_improvement=None, incumbent=None, stats=None,
+                         traversal='best', max_fringe=None, spill_path=None):
+    # deadline is a budget in seconds and max_nodes a budget of popped nodes,
+    # both checked before every node. on_improvement is called with a
+    # util.Improvement for each new incumbent. incumbent is a known solution
+    # (QCState or schedule) used for pruning from the first node on.
+    # traversal is one of TRAVERSALS:
+    # - 'best': lowest bound first
+    # - 'dfs': depth first, the children of a node in order of bound
+    # - 'dive': best first, diving from the popped node to a leaf through
+    #   the child of lowest bound every DIVE_INTERVAL nodes and until the
+    #   first incumbent; the other children go to the fringe
+    # With max_fringe, at most that many open nodes of 'best' and 'dive'
+    # are kept in memory, the others are stored as their task sequences in
+    # an SQLite file (spill_path, temporary by default). The 'dfs' fringe
+    # is bounded by the depth times the number of children.
+    # Returns the solution, the run time and the metrics.SolverStats of the
+    # run, collected into stats if given.
+    if traversal not in TRAVERSALS:
+        raise ValueError(f'Unknown traversal {traversal}, expected one of {TRAVERSALS}')
     logger.info('Branch and bound---------------------')
-    fringe = util.PriorityQueue()
-    explored = set()
-    start_node = qcs.getStartState()
-    fringe.push(start_node, qcs.computeLowBound(start_node))
-
-    objective = float('inf')
-    solution = None
-    count = 0
-
-    start_time = time()
-    while not fringe.isEmpty():
-        count += 1
-        if count % 100 == 0:
-            logger.info('ITERATION %d' % count)
-            if time() - start_time >= TIME_LIMIT:
+    stats = metrics.SolverStats('branch_and_bound') if stats is None else stats
+    with metrics.collecting(stats), contextlib.ExitStack() as cleanup:
+        start_time = time()
+        solution, objective = initial_incumbent(qcs, incumbent)
+
+        def restore(item):
+            # Spilled node with the current incumbent cut
+            schedule, bound = json.loads(item)
+            node = qcs.getScheduleState(schedule)
+            if objective < float('inf'):
+                qcs.addObjectiveUpBound(node, objective / qcs.ALPHA1)
+            return node, bound
+
+        if traversal == 'dfs':
+            fringe = util.Stack()
+            push = lambda node, bound: fringe.push((node, bound))
+        elif max_fringe is not None:
+            # Closed however the search ends
+            fringe = cleanup.enter_context(util.DiskBackedPriorityQueue(max_fringe, spill_path, lambda item: json.dumps((item[0].qc_assigned_tasks, item[1])), restore))
+        else:
+            fringe = util.PriorityQueue()
+        if traversal != 'dfs':
+            push = lambda node, bound: fringe.push((node, bound), bound)
+        explored = set()
+        dominance = util.DominanceTable()
+        start_node = qcs.getStartState()
+        if solution is not None:
+            qcs.addObjectiveUpBound(start_node, objective / qcs.ALPHA1)
+        dominance.insert(start_node.mask, start_node.qc_completion_time)
+        start_bound = qcs.computeLowBound(start_node)
+        push(start_node, start_bound)
+        dive = None
+
+        count = 0
+        while dive is not None or not fringe.isEmpty():
+            if time() - start_time >= deadline:
                 logger.info('Time limit exceeded')
                 break
-        node = fringe.pop()
-        node.lpModel.solve(PULP_CBC_CMD(msg=False))
-
-        if objective <= value(node.lpModel.objective) or not node.isFeasible():
-            explored.add(node)
-        elif qcs.isGoalState(node):
-            incumbent_objective = value(node.lpModel.objective)
-            if objective > incumbent_objective and node.isFeasible():
-                objective = incumbent_objective
-                solution = node
-                logger.info(f'(ITERATION {count}) New solution found: {node.objective()}')
-                logger.info(solution)
-        else:
-            # Branching
-            feasible_child_nodes = []
-            if node not in explored:
+            if max_nodes is not None and count >= max_nodes:
+                logger.info('Node limit reached')
+                break
+            count += 1
+            if count % 100 == 0:
+                logger.info('ITERATION %d', count)
+            stats.gauge('fringe', len(fringe))
+            if dive is not None:
+                (node, lower_bound), dive = dive, None
+                diving = True
+            else:
+                node, lower_bound = fringe.pop()
+                diving = traversal == 'dive' and (solution is None or count % DIVE_INTERVAL == 1)
+            if lower_bound >= objective:
+                stats.count('pruned_bound')
+                explored.add(node)
+                continue
+            if not dominance.contains(node.mask, node.qc_completion_time):
+                # Dominated by a state found after this one was pushed
+                stats.count('pruned_dominance')
+                explored.add(node)
+                continue
+            status, node_objective = qcs.evaluateNode(node)
+
+            if status != 'Optimal':
+                stats.count('pruned_infeasible')
+                explored.add(node)
+            elif objective <= node_objective:
+                stats.count('pruned_bound')
                 explored.add(node)
-                for child, _, _ in qcs.expand(node):
-                    if child not in explored:
-                        feasible_child_nodes.append(child)
-
-                feasible_child_nodes = delete_dominated_nodes(feasible_child_nodes)
-
-                # Calculate lower bound and prune sub-tree
-                for child_node in feasible_child_nodes:
-                    minimum_lower_bound = qcs.computeLowBound(child_node)
-                    if minimum_lower_bound < objective:
-                        fringe.push(child_node, minimum_lower_bound)
-
-    run_time = time() - start_time
-    logger.info(f'Done in {run_time}(s) with {count}(iters)')
-    return solution, run_time
-
-def delete_dominated_nodes(nodes):
-    dnodes = []
-    for node in nodes:
-        found = False
-        found_idx = -1
-        for idx, dnode in enumerate(dnodes):
-            if node.match(dnode):
-                found = True
-                if node.dominate(dnode):
-                    found_idx = idx
-            if found: break
-
-        if found_idx >= 0:
-            dnodes[found_idx] = node
-        elif not found:
-            dnodes.append(node)
-
-    return dnodes
+            elif qcs.isGoalState(node):
+                incumbent_objective = node_objective
+                if objective > incumbent_objective:
+                    objective = incumbent_objective
+                    solution = node
+                    stats.count('improvements')
+                    logger.info('(ITERATION %d) New solution found: %s', count, node.objective())
+                    logger.info('%s', solution)
+                    if on_improvement is not None:
+                        notify(on_improvement, solution, objective, start_time, fringe_bound(fringe, objective))
+            else:
+                children = sorted(branch(qcs, node, explored, objective, dominance), key=lambda child: child[1])
+                if diving and children:
+                    stats.count('dives')
+                    dive, children = children[0], children[1:]
+                if traversal == 'dfs':
+                    # The child of lowest bound is popped first
+                    children.reverse()
+                for child_node, minimum_lower_bound in children:
+                    push(child_node, minimum_lower_bound)
+
+        # The search is complete once the fringe is empty
+        best_bound = fringe_bound(fringe, objective)
+        if dive is not None:
+            best_bound = min(best_bound, dive[1])
+        if isinstance(fringe, util.DiskBackedPriorityQueue):
+            stats.set('spills', fringe.spills)
+
+    stats.set('nodes', count)
+    stats.set('objective', objective)
+    stats.set('solve_cache', qcs.solve_cache.stats())
+    stats.set('best_bound', best_bound)
+    run_time = stats.stop()
+    logger.info('Done in %s(s) with %d(iters)', run_time, count)
+    logger.info('%s', stats)
+    return solution, run_time, stats
+
+def branch_and_bound_parallel(qcs, workers=None, deadline=TIME_LIMIT, max_nodes=None, on_improvement=None, incumbent=None, stats=None):
+    # The master keeps the fringe and the incumbent and only branches; node
+    # LPs are solved by worker processes, each with its own copy of the base
+    # model. Workers skip nodes whose bound no longer beats the shared
+    # incumbent and cut the others with it. Arguments and result as in
+    # branch_and_bound_dfs, the nodes in flight count towards max_nodes and
+    # the workers' stats are merged into the master's.
+    logger.info('Parallel branch and bound---------------------')
+    workers = workers or os.cpu_count()
+    stats = metrics.SolverStats('branch_and_bound_parallel') if stats is None else stats
+    with metrics.collecting(stats):
+        start_time = time()
+        solution, objective = initial_incumbent(qcs, incumbent)
+        fringe = util.PriorityQueue()
+        explored = set()
+        dominance = util.DominanceTable()
+        start_node = qcs.getStartState(False)
+        dominance.insert(start_node.mask, start_node.qc_completion_time)
+        start_bound = qcs.computeLowBound(start_node)
+        fringe.push((start_node, start_bound), start_bound)
+
+        shared = multiprocessing.Value('d', objective)
+        count = 0
+        pending = {}
+
+        executor = ProcessPoolExecutor(workers, initializer=init_worker, initargs=(qcs, shared, stats.events is not None))
+        timed_out = False
+        try:
+            while not fringe.isEmpty() or pending:
+                if time() - start_time >= deadline:
+                    logger.info('Time limit exceeded')
+                    timed_out = True
+                    break
+
+                # Keep every worker busy with the most promising nodes
+                while not fringe.isEmpty() and len(pending) < 2 * workers:
+                    if max_nodes is not None and count >= max_nodes:
+                        break
+                    stats.gauge('fringe', len(fringe))
+                    node, lower_bound = fringe.pop()
+                    if lower_bound >= objective:
+                        stats.count('pruned_bound')
+                        explored.add(node)
+                        continue
+                    if not dominance.contains(node.mask, node.qc_completion_time):
+                        stats.count('pruned_dominance')
+                        explored.add(node)
+                        continue
+                    count += 1
+                    if count % 100 == 0:
+                        logger.info('ITERATION %d', count)
+                    pending[executor.submit(solve_node, node.qc_assigned_tasks, lower_bound)] = node, lower_bound
+                if not pending:
+                    if not fringe.isEmpty():
+                        logger.info('Node limit reached')
+                    break
+
+                done, _ = wait(pending, timeout=max(0, deadline - (time() - start_time)), return_when=FIRST_COMPLETED)
+                for future in done:
+                    node, _ = pending.pop(future)
+                    status, lp_objective, node_stats = future.result()
+                    stats.merge(node_stats)
+
+                    if status != 'Optimal':
+                        stats.count('pruned_infeasible' if status != 'Pruned' else 'pruned_bound')
+                        explored.add(node)
+                    elif objective <= lp_objective:
+                        stats.count('pruned_bound')
+                        explored.add(node)
+                    elif qcs.isGoalState(node):
+                        objective = lp_objective
+                        solution = node
+                        with shared.get_lock():
+                            shared.value = objective
+                        stats.count('improvements')
+                        logger.info('(ITERATION %d) New solution found: %s', count, node.objective())
+                        logger.info('%s', solution)
+                        if on_improvement is not None:
+                            bounds = [bound for _, bound in pending.values()]
+                            if not fringe.isEmpty():
+                                bounds.append(fringe.peekPriority())
+                            notify(on_improvement, solution, objective, start_time, min(bounds, default=objective))
+                    else:
+                        for child_node, minimum_lower_bound in branch(qcs, node, explored, objective, dominance):
+                            fringe.push((child_node, minimum_lower_bound), minimum_lower_bound)
+        finally:
+            # On timeout the nodes in flight are dropped, not waited for
+            executor.shutdown(wait=not timed_out, cancel_futures=True)
+
+        # Solve the winner once more in this process so it carries the model
+        if solution is not None:
+            solution = qcs.getScheduleState(solution.qc_assigned_tasks)
+            solution.status()
+
+    bounds = [bound for _, bound in pending.values()]
+    if not fringe.isEmpty():
+        bounds.append(fringe.peekPriority())
+    stats.set('nodes', count)
+    stats.set('objective', objective)
+    stats.set('solve_cache', qcs.solve_cache.stats())
+    stats.set('best_bound', min(bounds + [objective]))
+    run_time = stats.stop()
+    logger.info('Done in %s(s) with %d(iters)', run_time, count)
+    logger.info('%s', stats)
+    return solution, run_time, stats
+
+def fringe_bound(fringe, objective):
+    # Lowest bound of the open nodes, objective if none is below it
+    if fringe.isEmpty():
+        return objective
+    if isinstance(fringe, util.Stack):
+        return min(objective, min(bound for _, bound in fringe.list))
+    return min(objective, fringe.peekPriority())
+
+def notify(on_improvement, solution, objective, start_time, best_bound):
+    # Open nodes bounded above the incumbent cannot lower the best bound
+    best_bound = min(objective, best_bound)
+    on_improvement(util.Improvement(
+        solution.qc_assigned_tasks, objective, time() - start_time, util.relativeGap(objective, best_bound)))
+
+def initial_incumbent(qcs, incumbent):
+    # (solution, objective) to start from: the incumbent solved once, or
+    # nothing if there is none or the MILP rejects it
+    if incumbent is None:
+        return None, float('inf')
+    schedule = tuple(map(tuple, getattr(incumbent, 'qc_assigned_tasks', incumbent)))
+    solution = qcs.getScheduleState(schedule)
+    if not qcs.isGoalState(solution):
+        raise ValueError('Incumbent does not assign every task')
+    if solution.status() != 'Optimal':
+        logger.info('Incumbent rejected by the MILP')
+        return None, float('inf')
+    objective = solution.lpObjective()
+    logger.info('Starting from incumbent: %s', objective)
+    return solution, objective
+
+worker_qcs = None
+shared_incumbent = None
+worker_trace = False
+
+def init_worker(qcs, incumbent, trace=False):
+    global worker_qcs, shared_incumbent, worker_trace
+    worker_qcs = qcs
+    shared_incumbent = incumbent
+    worker_trace = trace
+
+def solve_node(schedule, lower_bound):
+    # (status, objective, stats of the solve)
+    stats = metrics.SolverStats('solve_node', worker_trace)
+    if lower_bound >= shared_incumbent.value:
+        return 'Pruned', None, stats
+    with metrics.collecting(stats):
+        node = worker_qcs.getScheduleState(schedule)
+        if shared_incumbent.value < float('inf'):
+            worker_qcs.addObjectiveUpBound(node, shared_incumbent.value / worker_qcs.ALPHA1)
+        status, objective = worker_qcs.evaluateNode(node)
+    return status, objective, stats
+
+def branch(qcs, node, explored, objective, dominance):
+    # Children of node that are neither explored, dominated nor bounded out,
+    # with their lower bounds. Dominance is checked against every state with
+    # the same assigned tasks seen so far, not only the siblings.
+    if node in explored:
+        return []
+    explored.add(node)
+
+    feasible_child_nodes = []
+    for child, _, _ in qcs.expand(node):
+        if child not in explored and dominance.insert(child.mask, child.qc_completion_time):
+            feasible_child_nodes.append(child)
+        else:
+            metrics.count('pruned_dominance')
+
+    # Calculate lower bound and prune sub-tree
+    result = []
+    for child_node in feasible_child_nodes:
+        minimum_lower_bound = qcs.computeLowBound(child_node)
+        if minimum_lower_bound < objective:
+            result.append((child_node, minimum_lower_bound))
+        else:
+            metrics.count('pruned_bound')
+    return result
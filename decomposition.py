@@ -0,0 +1,150 @@
+import os, random, logging
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from time import time
+import metrics
+from qc_scheduling import QCScheduling
+from branch_and_bound import branch_and_bound_dfs
+from grasp import launch, variable_neighborhood_descent, local_search, verify_solution, TIME_LIMIT
+
+logger = logging.getLogger()
+
+# Bay-zone decomposition for large vessels: the QCs, in bay order, are
+# grouped into zones of cranes_per_zone adjacent QCs and every task goes to
+# the zone of the nearest QC that reaches it. The zones are independent
+# QCScheduling instances solved in parallel; their schedules are merged and
+# a coordinating VND over the whole vessel repairs the PSI/PHI pairs and
+# crossings between zones and rebalances the boundary tasks.
+
+SOLVERS = ('grasp', 'branch_and_bound')
+# Share of the deadline given to the zone subproblems
+ZONE_SHARE = 0.5
+
+
+def partition_zones(qcs, cranes_per_zone=2):
+    # [(QCs, tasks)] per zone, QCs and tasks as indices of qcs
+    order = sorted(range(qcs.num_qcs), key=lambda qc: qcs.qc_locations[qc])
+    zones = [order[i:i + cranes_per_zone] for i in range(0, len(order), cranes_per_zone)]
+    zone_of = {qc: z for z, zone in enumerate(zones) for qc in zone}
+
+    tasks = [[] for _ in zones]
+    for task in range(qcs.num_tasks):
+        # Tasks out of every window go to the nearest QC
+        candidates = qcs.task_reach[task] or range(qcs.num_qcs)
+        qc = min(candidates, key=lambda qc: (abs(qcs.qc_locations[qc] - qcs.task_locations[task]), qc))
+        tasks[zone_of[qc]].append(task)
+    return [(zone, zone_tasks) for zone, zone_tasks in zip(zones, tasks)]
+
+def zone_instance(qcs, zone, tasks):
+    # Subproblem of the tasks of a zone, with the PSI/PHI pairs inside it and
+    # the bay windows of the full instance
+    local = {task: i for i, task in enumerate(tasks)}
+    pairs = lambda pairs: {(local[i - 1] + 1, local[j - 1] + 1) for i, j in pairs if i - 1 in local and j - 1 in local}
+    sub = QCScheduling(len(tasks), len(zone), [qcs.task_durations[task] for task in tasks], [qcs.task_locations[task] for task in tasks],
+                       [qcs.qc_locations[qc] for qc in zone], pairs(qcs.non_simultaneous_tasks), pairs(qcs.precedence_constrained_tasks),
+                       qcs.low_bounds, qcs.solver, qcs.solve_cache.maxsize, qcs.node_evaluation)
+    sub.task_reach = [tuple(k for k, qc in enumerate(zone) if qc in qcs.task_reach[task]) for task in tasks]
+    sub.qc_reach = [0] * len(zone)
+    for i, reach in enumerate(sub.task_reach):
+        # A task nobody reaches was given to the zone of its nearest QC
+        if not reach:
+            reach = sub.task_reach[i] = (min(range(len(zone)), key=lambda k: abs(sub.qc_locations[k] - sub.task_locations[i])),)
+        for k in reach:
+            sub.qc_reach[k] |= 1 << i
+    return sub
+
+def solve_zone(sub, solver, alpha, early_stop, start_time, deadline, seed, trace=False):
+    # Runs in a worker process, returns (schedule, stats). The schedule is
+    # only guaranteed to be feasible within the zone if the solver found one.
+    # deadline counts from start_time, shared by the zones: they may queue
+    # for a worker.
+    stats = metrics.SolverStats(f'zone_{solver}', trace)
+    if sub.num_tasks == 0:
+        return ((),) * sub.num_qcs, stats
+    deadline -= time() - start_time
+    if solver == 'grasp':
+        # launch draws from the global generators
+        random.seed(seed)
+        np.random.seed(seed)
+        solution, _, stats = launch(sub, alpha, early_stop, vnd=True, deadline=deadline, stats=stats)
+    else:
+        solution, _, stats = branch_and_bound_dfs(sub, deadline=deadline, stats=stats)
+    if solution is None:
+        # The construction gets stuck on the PHI pairs of large zones: start
+        # from a schedule that may violate them and let VND repair it, the
+        # coordination pass goes on from what is left
+        with metrics.collecting(stats), metrics.timed('relaxed_construction'):
+            solution = variable_neighborhood_descent(relaxed_schedule(sub), sub, deadline=deadline - (time() - stats.start_time))
+        stats.set('zone_violations', sub.countViolations(solution))
+    return solution.qc_assigned_tasks, stats
+
+def relaxed_schedule(qcs):
+    # Tasks in bay order, each to the least loaded QC that reaches it
+    schedule = [[] for _ in range(qcs.num_qcs)]
+    loads = [0] * qcs.num_qcs
+    for task in sorted(range(qcs.num_tasks), key=lambda task: (qcs.task_locations[task], task)):
+        qc = min(qcs.task_reach[task], key=lambda qc: (loads[qc], qc))
+        schedule[qc].append(task)
+        loads[qc] += qcs.task_durations[task]
+    state = qcs.getScheduleState(schedule, False)
+    state.evaluate(qcs)
+    return state
+
+
+def decompose(qcs, cranes_per_zone=2, solver='grasp', workers=None, alpha=0.4, early_stop=50, deadline=TIME_LIMIT,
+              zone_deadline=None, seed=None, verify=False, stats=None):
+    # Solves the zones with solver within zone_deadline (ZONE_SHARE of the
+    # deadline by default), then coordinates the merged schedule until it
+    # is feasible and locally optimal or the deadline is reached. The zones
+    # never eat into the coordination reserve, whatever zone_deadline says.
+    # The full MILP is only checked with verify=True since its size grows
+    # with the square of the tasks.
+    # Returns (solution, run_time, stats) as the other solvers.
+    logger.info('Decomposition---------------------')
+    stats = metrics.SolverStats('decomposition') if stats is None else stats
+    reserve = deadline * (1 - ZONE_SHARE)
+    zone_deadline = deadline if zone_deadline is None else zone_deadline
+    with metrics.collecting(stats):
+        partition = partition_zones(qcs, cranes_per_zone)
+        subs = [zone_instance(qcs, zone, tasks) for zone, tasks in partition]
+        for (zone, tasks), sub in zip(partition, subs):
+            logger.info('Zone of QCs %s: %d tasks', zone, len(tasks))
+
+        seeds = np.random.SeedSequence(seed).generate_state(len(subs))
+        # Building the zones counts against their share
+        zone_deadline = min(zone_deadline, deadline - reserve - (time() - stats.start_time))
+        with metrics.timed('zones'):
+            with ProcessPoolExecutor(workers or min(len(subs), os.cpu_count())) as executor:
+                results = list(executor.map(solve_zone, subs, [solver] * len(subs), [alpha] * len(subs), [early_stop] * len(subs),
+                                             [time()] * len(subs), [zone_deadline] * len(subs), [int(s) for s in seeds], [stats.events is not None] * len(subs)))
+
+        schedule = [()] * qcs.num_qcs
+        for (zone, tasks), (zone_schedule, zone_stats) in zip(partition, results):
+            stats.merge(zone_stats)
+            for k, qc in enumerate(zone):
+                schedule[qc] = tuple(tasks[i] for i in zone_schedule[k])
+
+        sol = qcs.getScheduleState(schedule, False)
+        sol.evaluate(qcs)
+        stats.set('merged_objective', sol.objective())
+        stats.set('merged_violations', qcs.countViolations(sol))
+        logger.info('Merged zones: %s (%d violations)', sol.objective(), stats['merged_violations'])
+        with metrics.timed('coordination'):
+            sol = variable_neighborhood_descent(sol, qcs, deadline=deadline - (time() - stats.start_time))
+            remaining = deadline - (time() - stats.start_time)
+            if remaining > 0:
+                sol = local_search(sol, early_stop, qcs, deadline=remaining)
+        best_sol = None
+        if sol.evaluate(qcs):
+            best_sol = sol
+        else:
+            logger.info('Coordination left %d violations', qcs.countViolations(sol))
+        if verify:
+            best_sol = verify_solution(best_sol, qcs)
+
+    stats.set('zones', len(subs))
+    stats.set('objective', best_sol.objective() if best_sol is not None else None)
+    run_time = stats.stop()
+    logger.info('Done in %s(s)', run_time)
+    logger.info('%s', stats)
+    return best_sol, run_time, stats
@@ -0,0 +1,244 @@
+from collections import namedtuple
+from time import time
+import logging
+import util
+import metrics
+from grasp import verify_solution
+
+TIME_LIMIT = 10800 # 3 hours
+
+logger = logging.getLogger()
+
+# Exact solver for instances without PSI/PHI pairs, no LP is solved before
+# the final schedule is verified. Without them the makespan only depends on
+# which QC does each task unless two QCs may cross (11), so:
+# 1. a DP assigns the tasks one by one over QC load vectors, keeping per
+#    layer the Pareto set of the loads (QCs with the same bay window are
+#    interchangeable and their loads are sorted). Its optimum is a lower
+#    bound, and the optimal makespan when no crossing is possible.
+# 2. otherwise the no-wait sequences are enumerated in start time order,
+#    always extending the QC that is free first. Only the last task of each
+#    QC can still overlap a new task, so states are (assigned tasks, loads,
+#    last tasks, stopped QCs) and crossings are checked against last tasks.
+#    The MILP lets a QC wait for another to clear its way, which this search
+#    does not, so its schedule is only reported optimal if it meets the
+#    bound of 1. or if no crossing ever cut a sequence short.
+
+Node = namedtuple('Node', ['mask', 'qc_completion_time'])
+
+
+def dynamic_programming(qcs, deadline=TIME_LIMIT, verify=True, stats=None):
+    # Returns the solution, the run time and the metrics.SolverStats of the
+    # run as the other solvers; stats['optimal'] tells whether the search
+    # completed within deadline seconds. With verify the final schedule goes
+    # through the MILP.
+    logger.info('Dynamic programming---------------------')
+    if qcs.non_simultaneous_tasks or qcs.precedence_constrained_tasks:
+        raise ValueError('The dynamic program does not handle PSI/PHI pairs')
+    stats = metrics.SolverStats('dynamic_programming') if stats is None else stats
+    with metrics.collecting(stats):
+        start_time = time()
+        with metrics.timed('assignment'):
+            bound, schedule, complete = assignment_dp(qcs, start_time, deadline)
+        objective = bound
+        if not complete:
+            # bound is then only the makespan of the greedy assignment
+            bound = qcs.computeLowBound(qcs.getStartState(False))
+        if schedule is not None and crossings_possible(qcs):
+            # Sequenced in bay order the assignment may already be feasible
+            state = qcs.getScheduleState(schedule, False)
+            state.evaluate(qcs)
+            if qcs.countViolations(state) > 0:
+                with metrics.timed('sequencing'):
+                    objective, schedule, complete = sequence_search(qcs, bound, start_time, deadline)
+
+        solution = None
+        if schedule is not None:
+            solution = qcs.getScheduleState(schedule, False)
+            solution.evaluate(qcs)
+            logger.info('Optimal solution: %s' if complete else 'Best solution: %s', objective)
+            logger.info('%s', solution)
+            if verify:
+                solution = verify_solution(solution, qcs)
+
+    stats.set('objective', objective)
+    stats.set('best_bound', bound)
+    stats.set('optimal', complete)
+    run_time = stats.stop()
+    logger.info('Done in %s(s)', run_time)
+    logger.info('%s', stats)
+    return solution, run_time, stats
+
+
+def crossings_possible(qcs):
+    # Whether some pair of (11) can be processed by QCs in the crossing order
+    for i, j in zip(*qcs.crossing_pairs.tolist()):
+        if any(qcs.qc_rank[a] > qcs.qc_rank[b] for a in qcs.task_reach[i] for b in qcs.task_reach[j]):
+            return True
+    return False
+
+def assignment_dp(qcs, start_time, deadline):
+    # (makespan, schedule, complete) of the best assignment of the tasks to
+    # the QCs, each QC doing its tasks in bay order. complete is False if the
+    # deadline was reached first, the schedule is then the greedy one.
+    durations = qcs.task_durations
+    groups = {}
+    for qc in range(qcs.num_qcs):
+        groups.setdefault(qcs.qc_reach[qc], []).append(qc)
+    groups = [cranes for cranes in groups.values() if len(cranes) > 1]
+
+    def canonical(ck):
+        ck = list(ck)
+        for cranes in groups:
+            for qc, load in zip(cranes, sorted(ck[qc] for qc in cranes)):
+                ck[qc] = load
+        return tuple(ck)
+
+    if any(not reach for reach in qcs.task_reach):
+        return float('inf'), None, True
+    # Longest tasks first, the greedy assignment is the initial incumbent
+    order = sorted(range(qcs.num_tasks), key=lambda task: (-durations[task], task))
+    best, assignment = greedy_assignment(qcs, order)
+
+    layers = []
+    layer = {(0,) * qcs.num_qcs: None}
+    mask = 0
+    for task in order:
+        mask |= 1 << task
+        candidates = {}
+        for key in layer:
+            if time() - start_time >= deadline:
+                # Part of the layer is missing, an empty one proves nothing
+                logger.info('Time limit exceeded')
+                return best, bay_order(qcs, assignment), False
+            for qc in qcs.task_reach[task]:
+                ck = list(key)
+                ck[qc] += durations[task]
+                ck = canonical(ck)
+                metrics.count('states')
+                if ck in candidates:
+                    metrics.count('pruned_dominance')
+                elif qcs.computeLowBound(Node(mask, ck)) >= best:
+                    metrics.count('pruned_bound')
+                else:
+                    candidates[ck] = (key, qc)
+
+        # Loads no lower on every QC than another state's cannot do better
+        dominance = util.DominanceTable()
+        for ck in sorted(candidates, key=sum):
+            if time() - start_time >= deadline:
+                logger.info('Time limit exceeded')
+                return best, bay_order(qcs, assignment), False
+            dominance.insert(mask, ck)
+        layer = {ck: parent for ck, parent in candidates.items() if dominance.contains(mask, ck)}
+        metrics.count('pruned_dominance', len(candidates) - len(layer))
+        metrics.gauge('layer', len(layer))
+        layers.append(layer)
+        if not layer:
+            # Nothing beats the incumbent
+            return best, bay_order(qcs, assignment), True
+
+    ck = min(layer, key=max)
+    best = max(ck)
+
+    # Replay the choices from the start, a choice made on a sorted load
+    # goes to any QC of the same bay window with that load
+    choices = []
+    for layer in reversed(layers):
+        key, qc = layer[ck]
+        choices.append((key, qc))
+        ck = key
+    loads = [0] * qcs.num_qcs
+    assignment = [[] for _ in range(qcs.num_qcs)]
+    for task, (key, qc) in zip(order, reversed(choices)):
+        qc = next(other for other in range(qcs.num_qcs) if qcs.qc_reach[other] == qcs.qc_reach[qc] and loads[other] == key[qc]) \
+            if any(qc in cranes for cranes in groups) else qc
+        loads[qc] += durations[task]
+        assignment[qc].append(task)
+    return best, bay_order(qcs, assignment), True
+
+def greedy_assignment(qcs, order):
+    # Each task to the least loaded QC that reaches it
+    loads = [0] * qcs.num_qcs
+    assignment = [[] for _ in range(qcs.num_qcs)]
+    for task in order:
+        qc = min(qcs.task_reach[task], key=lambda qc: (loads[qc], qc))
+        loads[qc] += qcs.task_durations[task]
+        assignment[qc].append(task)
+    return max(loads), assignment
+
+def bay_order(qcs, assignment):
+    return [sorted(tasks, key=lambda task: (qcs.task_locations[task], task)) for tasks in assignment]
+
+def sequence_search(qcs, lower_bound, start_time, deadline):
+    # (makespan, schedule, complete) of the best no-wait schedule without
+    # crossings, by depth-first search over the states described above.
+    # Stops early on a schedule meeting lower_bound. complete is False if a
+    # crossing was avoided, a schedule with waiting times may then be better.
+    durations, locations = qcs.task_durations, qcs.task_locations
+    total = sum(durations)
+    best, best_schedule = float('inf'), None
+    blocked = False
+
+    fringe = util.Stack()
+    visited = set()
+    # (assigned mask, loads, last task per QC, stopped QCs mask, work left, schedule)
+    fringe.push((0, (0,) * qcs.num_qcs, (None,) * qcs.num_qcs, 0, total, ((),) * qcs.num_qcs))
+    while not fringe.isEmpty():
+        if time() - start_time >= deadline:
+            logger.info('Time limit exceeded')
+            return best, best_schedule, False
+        mask, ck, last, stopped, work, schedule = fringe.pop()
+        key = (mask, ck, last, stopped)
+        if key in visited:
+            metrics.count('pruned_dominance')
+            continue
+        visited.add(key)
+        metrics.count('states')
+
+        if mask == qcs.full_mask:
+            if max(ck) < best:
+                best, best_schedule = max(ck), schedule
+                metrics.count('improvements')
+                logger.info('New solution found: %s', best)
+                if best <= lower_bound:
+                    return best, best_schedule, True
+            continue
+
+        running = [qc for qc in range(qcs.num_qcs) if not stopped >> qc & 1]
+        reach = 0
+        for qc in running:
+            reach |= qcs.qc_reach[qc]
+        remaining = qcs.full_mask & ~mask
+        if remaining & ~reach or max(max(ck), (sum(ck[qc] for qc in running) + work) / len(running)) >= best:
+            metrics.count('pruned_bound')
+            continue
+
+        qc = min(running, key=lambda qc: (ck[qc], qc))
+        start = ck[qc]
+        if len(running) > 1:
+            # The QC takes no more tasks
+            fringe.push((mask, ck, last, stopped | 1 << qc, work, schedule))
+        children = []
+        for task in util.iterBits(qcs.qc_reach[qc] & remaining):
+            # Tasks of other QCs still running at start overlap the new one (11)
+            if any(crossing(qcs.qc_rank[qc], task, qcs.qc_rank[other], last[other], locations)
+                   for other in range(qcs.num_qcs) if other != qc and last[other] is not None and ck[other] > start):
+                metrics.count('crossings_avoided')
+                blocked = True
+                continue
+            new_ck = ck[:qc] + (start + durations[task],) + ck[qc + 1:]
+            children.append((mask | 1 << task, new_ck, last[:qc] + (task,) + last[qc + 1:], stopped, work - durations[task],
+                             schedule[:qc] + (schedule[qc] + (task,),) + schedule[qc + 1:]))
+        # Tasks closest to the QC are popped first
+        children.sort(key=lambda child: -abs(locations[child[2][qc]] - qcs.qc_locations[qc]))
+        for child in children:
+            fringe.push(child)
+
+    if blocked:
+        logger.info('Sequences were cut by crossings, waiting may do better')
+    return best, best_schedule, not blocked
+
+def crossing(qc, task, other, other_task, locations):
+    # qc and other are the bay-order ranks of the QCs
+    return (locations[task] < locations[other_task] and qc > other) or (locations[other_task] < locations[task] and other > qc)
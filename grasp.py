@@ -1,6 +1,11 @@
 # Ref: https://github.com/angrymushroom/GRASP
 
-import random, logging
+import os, random, logging, queue
+import multiprocessing
+import numpy as np
+import util
+import metrics
+from concurrent.futures import ProcessPoolExecutor, wait
 from time import time
 
 MAX_ITERATION = 1000
@@ -8,89 +13,368 @@ TIME_LIMIT = 10800 # 3 hours
 
 logger = logging.getLogger()
 
-def launch(qcs, alpha, early_stop):
+def launch(qcs, alpha, early_stop, vnd=False, deadline=TIME_LIMIT, max_iterations=MAX_ITERATION, on_improvement=None, stats=None):
+    # deadline is a budget in seconds, checked before every iteration.
+    # on_improvement is called with a util.Improvement for each new
+    # incumbent, the gap is taken to the lower bound of the start state.
+    # Returns the solution, the run time and the metrics.SolverStats of the
+    # run, collected into stats if given.
     logger.info('GRASP---------------------')
-    count = 0
-    start_time = time()
+    stats = metrics.SolverStats('grasp') if stats is None else stats
+    with metrics.collecting(stats):
+        count = 0
+        start_time = time()
 
-    best_cost = float('inf')
-    best_sol = None
+        best_cost = float('inf')
+        best_sol = None
+        best_bound = qcs.computeLowBound(qcs.getStartState(False))
 
-    while count < MAX_ITERATION:
-        count += 1
-        if count % 100 == 0:
-            logger.info('ITERATION %d' % count)
-            if time() - start_time >= TIME_LIMIT:
+        while count < max_iterations:
+            if time() - start_time >= deadline:
                 logger.info('Time limit exceeded')
                 break
-        new_sol = construct_greedy_solution(qcs, alpha)
-        if new_sol is None:
-            continue
-        new_sol = local_search(new_sol, early_stop, qcs)
+            count += 1
+            if count % 100 == 0:
+                logger.info('ITERATION %d', count)
+            new_sol = grasp_iteration(qcs, alpha, early_stop, vnd, deadline=deadline - (time() - start_time))
+            if new_sol is None:
+                continue
+
+            if new_sol.objective() < best_cost and new_sol.evaluate(qcs):
+                best_cost = new_sol.objective()
+                best_sol = new_sol
+                stats.count('improvements')
+                logger.info('(ITERATION %d) New solution found: %s', count, best_cost)
+                logger.info('%s', best_sol)
+                if on_improvement is not None:
+                    notify(on_improvement, best_sol.qc_assigned_tasks, best_cost, time() - start_time, best_bound)
+
+        best_sol = verify_solution(best_sol, qcs)
+
+    stats.set('iterations', count)
+    stats.set('objective', best_cost)
+    stats.set('best_bound', best_bound)
+    stats.set('solve_cache', qcs.solve_cache.stats())
+    run_time = stats.stop()
+    logger.info('Done in %s(s) with %d(iters)', run_time, count)
+    logger.info('%s', stats)
+    return best_sol, run_time, stats
+
+
+def launch_parallel(qcs, alpha, early_stop, workers=None, seed=None, patience=None, vnd=False,
+                    deadline=TIME_LIMIT, max_iterations=MAX_ITERATION, on_improvement=None, stats=None):
+    # Iterations are dealt round-robin to the workers, each with its own RNG
+    # stream spawned from seed. A worker gives up after patience consecutive
+    # iterations that do not beat its own best solution, so the iterations
+    # it runs only depend on its stream: unless the deadline is reached the
+    # result only depends on seed and workers, with or without patience.
+    # Other arguments and result as in launch: workers
+    # report each improvement of the shared incumbent through a queue and
+    # their stats are merged at the end.
+    logger.info('Parallel GRASP---------------------')
+    workers = workers or os.cpu_count()
+    stats = metrics.SolverStats('grasp_parallel') if stats is None else stats
+    with metrics.collecting(stats):
+        start_time = time()
+
+        incumbent = multiprocessing.Value('d', float('inf'))
+        improvements = multiprocessing.Queue() if on_improvement is not None else None
+        best_bound = qcs.computeLowBound(qcs.getStartState(False))
+        streamed = [float('inf')]
+        streams = np.random.SeedSequence(seed).spawn(workers)
+        with ProcessPoolExecutor(workers, initializer=init_worker, initargs=(incumbent, improvements)) as executor:
+            futures = [
+                executor.submit(run_worker, qcs, alpha, early_stop, range(w + 1, max_iterations + 1, workers),
+                                stream, patience, start_time, vnd, deadline, stats.events is not None)
+                for w, stream in enumerate(streams)
+            ]
+            running = set(futures)
+            while running and improvements is not None:
+                _, running = wait(running, timeout=0.1)
+                drain_improvements(improvements, on_improvement, best_bound, streamed)
+            results = [future.result() for future in futures]
+        if improvements is not None:
+            drain_improvements(improvements, on_improvement, best_bound, streamed)
+
+        # Ties are broken by iteration number so the winner does not depend on timing
+        for _, _, _, worker_stats in results:
+            stats.merge(worker_stats)
+        count = stats['iterations']
+        found = [(cost, iteration, schedule) for cost, iteration, schedule, _ in results if schedule is not None]
+        best_cost = float('inf')
+        best_sol = None
+        if found:
+            best_cost, iteration, schedule = min(found, key=lambda result: result[:2])
+            best_sol = qcs.getScheduleState(schedule, False)
+            best_sol.evaluate(qcs)
+            logger.info('(ITERATION %d) Best solution: %s', iteration, best_cost)
+            logger.info('%s', best_sol)
+        best_sol = verify_solution(best_sol, qcs)
+
+    stats.set('iterations', count)
+    stats.set('objective', best_cost)
+    stats.set('best_bound', best_bound)
+    run_time = stats.stop()
+    logger.info('Done in %s(s) with %d(iters)', run_time, count)
+    logger.info('%s', stats)
+    return best_sol, run_time, stats
+
 
-        if new_sol.objective() < best_cost and new_sol.isFeasible():
-            best_cost = new_sol.objective()
-            best_sol = new_sol
-            logger.info(f'(ITERATION {count}) New solution found: {best_cost}')
-            logger.info(best_sol)
+def notify(on_improvement, schedule, cost, elapsed, best_bound):
+    on_improvement(util.Improvement(schedule, cost, elapsed, util.relativeGap(cost, best_bound)))
 
-    run_time = time() - start_time
-    logger.info(f'Done in {run_time}(s) with {count}(iters)')
-    return best_sol, run_time
 
+def drain_improvements(improvements, on_improvement, best_bound, streamed):
+    # Workers race on the shared incumbent, only strict improvements on what
+    # was already streamed are passed on
+    while True:
+        try:
+            cost, schedule, elapsed = improvements.get_nowait()
+        except queue.Empty:
+            return
+        if cost < streamed[0]:
+            streamed[0] = cost
+            notify(on_improvement, schedule, cost, elapsed, best_bound)
+
+
+shared_incumbent = None
+shared_improvements = None
+
+def init_worker(incumbent, improvements=None):
+    global shared_incumbent, shared_improvements
+    shared_incumbent = incumbent
+    shared_improvements = improvements
+
+
+def run_worker(qcs, alpha, early_stop, iterations, seed, patience, start_time, vnd, deadline=TIME_LIMIT, trace=False):
+    rng = np.random.default_rng(seed)
+    stats = metrics.SolverStats('grasp_worker', trace)
+    best_cost = float('inf')
+    best_iteration = None
+    best_schedule = None
+    idle = 0
+
+    with metrics.collecting(stats):
+        for iteration in iterations:
+            if time() - start_time >= deadline:
+                break
+            if patience is not None and idle >= patience:
+                break
+            stats.count('iterations')
+            idle += 1
+            new_sol = grasp_iteration(qcs, alpha, early_stop, vnd, rng, deadline - (time() - start_time))
+            if new_sol is None:
+                continue
+
+            if new_sol.objective() < best_cost and new_sol.evaluate(qcs):
+                best_cost = new_sol.objective()
+                best_iteration = iteration
+                best_schedule = new_sol.qc_assigned_tasks
+                idle = 0
+                # The shared incumbent only filters the streamed improvements
+                with shared_incumbent.get_lock():
+                    if best_cost < shared_incumbent.value:
+                        shared_incumbent.value = best_cost
+                        stats.count('improvements')
+                        if shared_improvements is not None:
+                            shared_improvements.put((best_cost, best_schedule, time() - start_time))
+
+    return best_cost, best_iteration, best_schedule, stats
+
+
+def grasp_iteration(qcs, alpha, early_stop, vnd, rng=None, deadline=TIME_LIMIT):
+    # Greedy randomized construction then its improvement, None if the
+    # construction gets stuck. The improvement stops with what it has after
+    # deadline seconds.
+    with metrics.timed('construction'):
+        sol = construct_greedy_solution(qcs, alpha, rng)
+    if sol is None:
+        metrics.count('construction_failures')
+        return None
+    if vnd:
+        with metrics.timed('vnd'):
+            return variable_neighborhood_descent(sol, qcs, deadline=deadline)
+    with metrics.timed('local_search'):
+        return local_search(sol, early_stop, qcs, rng, deadline=deadline)
 
-def construct_greedy_solution(qcs, alpha):
+
+def verify_solution(best_sol, qcs):
+    # Only the final incumbent goes through the MILP
+    if best_sol is not None:
+        best_sol.evaluateGrasp(qcs)
+        if not best_sol.isFeasible():
+            logger.info('Best solution rejected by the MILP')
+            return None
+    return best_sol
+
+
+def construct_greedy_solution(qcs, alpha, rng=None):
     state = qcs.getStartState(False)
     while not qcs.isGoalState(state):
-        state = qcs.expandGrasp(state, alpha)
+        state = qcs.expandGrasp(state, alpha, rng)
         if state is None:
             return None
 
     return state
 
 
-def local_search(sol, early_stop, qcs):
+def local_search(sol, early_stop, qcs, rng=None, fixed=None, deadline=TIME_LIMIT):
+    # fixed: number of leading tasks of each QC that must stay in place
+    # deadline: budget in seconds, the current solution is returned once spent
+    start_time = time()
     cost = sol.objective()
+    violations = qcs.countViolations(sol)
 
     for qc in range(qcs.num_qcs):
         count = 0
         while count < early_stop:
+            if time() - start_time >= deadline:
+                logger.info('Time limit exceeded')
+                return sol
             count += 1
-            new_sol = stochastic_swap(sol, qc)  # randomly swap two edges to explore the possible neighbors.
-            if new_sol is None:
+            move = stochastic_swap(sol, qc, rng, fixed)  # randomly swap two edges to explore the possible neighbors.
+            if move is None:
                 break
 
-            new_sol.evaluateGrasp(qcs)
-            new_cost = new_sol.objective()   # calculate the total cost of a solution
+            # cost and feasibility impact of the move, the solution is only rebuilt if it is accepted
+            delta_cost, delta_violations = sol.evaluateMove(qcs, move)
+            metrics.count('moves_evaluated')
 
-            #  update the solution and cost if a better solution is found
-            if new_cost < cost and new_sol.isFeasible():
-                logger.info(f'Local search improvement: {new_cost}')
-                logger.info(new_sol)
-                sol = new_sol
-                cost = new_cost
+            #  update the solution and cost if a better solution is found,
+            #  or if the move repairs violated constraints without making it worse
+            if (delta_cost < 0 and violations + delta_violations == 0) or (delta_violations < 0 and delta_cost <= 0):
+                sol = sol.applyMove(qcs, move)
+                cost += delta_cost
+                violations += delta_violations
+                metrics.count('moves_applied')
+                logger.info('Local search improvement: %s (%d violations)', cost, violations)
+                logger.info('%s', sol)
                 count = 0
-            else:
-                del new_sol
 
     return sol
 
 
-def stochastic_swap(sol, qc):
+def stochastic_swap(sol, qc, rng=None, fixed=None):
+    # Move (QC -> new task sequence) swapping two random tasks of qc
     sol_size = len(sol.qc_assigned_tasks[qc])
+    start = fixed[qc] if fixed else 0
     # cannot swap if there are less than 2 tasks -> skip QC
-    if sol_size < 2:
+    if sol_size - start < 2:
         return None
     
-    sol_copy = sol.clone()
-    indices = list(range(sol_size))
+    indices = list(range(start, sol_size))
 
-    index1 = random.choice(indices)
+    rng = random if rng is None else rng
+    index1 = rng.choice(indices)
     indices.remove(index1)
-    index2 = random.choice(indices)
+    index2 = rng.choice(indices)
+
+    tasks = list(sol.qc_assigned_tasks[qc])
+    tasks[index1], tasks[index2] = tasks[index2], tasks[index1]
+
+    return {qc: tasks}
+
+
+def variable_neighborhood_descent(sol, qcs, fixed=None, deadline=TIME_LIMIT):
+    # Scan the neighborhoods in order for the first improving move, go back
+    # to the first neighborhood after every improvement and stop when none
+    # of them improves or after deadline seconds. Solutions compare by
+    # number of violated constraints, then by QC completion times sorted in
+    # decreasing order (the makespan, then how loaded the other QCs are).
+    # The first fixed[qc] tasks of each QC are never moved.
+    neighborhoods = (relocate_moves, exchange_moves, reverse_moves)
+    start_time = time()
+    violations = qcs.countViolations(sol)
+    k = 0
+    while k < len(neighborhoods):
+        remaining = deadline - (time() - start_time)
+        if remaining <= 0:
+            logger.info('Time limit exceeded')
+            break
+        improvement = first_improvement(sol, qcs, neighborhoods[k], violations, fixed, remaining)
+        if improvement is None:
+            k += 1
+            continue
+
+        move, violations = improvement
+        sol = sol.applyMove(qcs, move)
+        metrics.count('moves_applied')
+        logger.info('VND improvement: %s (%d violations)', sol.objective(), violations)
+        logger.info('%s', sol)
+        k = 0
+
+    return sol
+
+
+def first_improvement(sol, qcs, neighborhood, violations, fixed=None, deadline=TIME_LIMIT):
+    # None if no move improves, or none was found within deadline seconds
+    start_time = time()
+    key = sorted(sol.qc_completion_time, reverse=True)
+    for loads, moves in neighborhood(sol, qcs, fixed or (0,) * qcs.num_qcs):
+        ck = list(sol.qc_completion_time)
+        for qc, load in loads.items():
+            ck[qc] = load
+        new_key = sorted(ck, reverse=True)
+
+        # A feasible solution can only improve through the QC loads, which
+        # are known without evaluating the moves
+        if violations == 0 and not new_key < key:
+            continue
+
+        for move in moves:
+            if time() - start_time >= deadline:
+                return None
+            _, delta_violations = sol.evaluateMove(qcs, move)
+            metrics.count('moves_evaluated')
+            if (violations + delta_violations, new_key) < (violations, key):
+                return move, violations + delta_violations
+
+    return None
+
+
+# Neighborhoods yield (new QC loads, moves): the moves of a group change the
+# QC completion times the same way and only differ in timing. Positions
+# before fixed[qc] are left as they are.
+
+def relocate_moves(sol, qcs, fixed):
+    # Move a task to any position of another QC whose bay window contains it,
+    # a QC is never left without tasks
+    assigned = sol.qc_assigned_tasks
+    for a, tasks_a in enumerate(assigned):
+        if len(tasks_a) == 1:
+            continue
+        for p in range(fixed[a], len(tasks_a)):
+            task = tasks_a[p]
+            rest = tasks_a[:p] + tasks_a[p + 1:]
+            for b, tasks_b in enumerate(assigned):
+                if b == a or not qcs.qc_reach[b] >> task & 1:
+                    continue
+                loads = {a: sol.qc_completion_time[a] - qcs.task_durations[task], b: sol.qc_completion_time[b] + qcs.task_durations[task]}
+                yield loads, ({a: rest, b: tasks_b[:q] + (task,) + tasks_b[q:]} for q in range(fixed[b], len(tasks_b) + 1))
+
+
+def exchange_moves(sol, qcs, fixed):
+    # Swap two tasks of different QCs, each taking the other's position
+    assigned = sol.qc_assigned_tasks
+    for a, tasks_a in enumerate(assigned):
+        for b in range(a + 1, len(assigned)):
+            tasks_b = assigned[b]
+            for p in range(fixed[a], len(tasks_a)):
+                task_a = tasks_a[p]
+                if not qcs.qc_reach[b] >> task_a & 1:
+                    continue
+                for q in range(fixed[b], len(tasks_b)):
+                    task_b = tasks_b[q]
+                    if not qcs.qc_reach[a] >> task_b & 1:
+                        continue
+                    delta = qcs.task_durations[task_b] - qcs.task_durations[task_a]
+                    loads = {a: sol.qc_completion_time[a] + delta, b: sol.qc_completion_time[b] - delta}
+                    move = {a: tasks_a[:p] + (task_b,) + tasks_a[p + 1:], b: tasks_b[:q] + (task_a,) + tasks_b[q + 1:]}
+                    yield loads, [move]
 
-    temp_task = sol_copy.qc_assigned_tasks[qc][index1]
-    sol_copy.qc_assigned_tasks[qc][index1] = sol_copy.qc_assigned_tasks[qc][index2]
-    sol_copy.qc_assigned_tasks[qc][index2] = temp_task
 
-    return sol_copy
+def reverse_moves(sol, qcs, fixed):
+    # Reverse a segment of a QC's sequence (2-opt)
+    for a, tasks in enumerate(sol.qc_assigned_tasks):
+        segments = ((p, q) for p in range(fixed[a], len(tasks)) for q in range(p + 2, len(tasks) + 1))
+        yield {}, ({a: tasks[:p] + tasks[p:q][::-1] + tasks[q:]} for p, q in segments)
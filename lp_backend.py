@@ -0,0 +1,120 @@
+from pulp import LpSolver, PULP_CBC_CMD, getSolver, LpMinimize, LpInteger
+from pulp import LpStatusOptimal, LpStatusInfeasible, LpStatusUnbounded, LpStatusNotSolved
+from pulp import LpSolutionOptimal, LpSolutionInfeasible, LpSolutionUnbounded, LpSolutionNoSolutionFound
+
+try:
+    import highspy
+except ImportError:
+    highspy = None
+
+
+class HiGHSPersistent(LpSolver):
+    """
+      In-process HiGHS solver for a model that is solved many times with
+      different variable bounds. The model is loaded into HiGHS on the first
+      solve and kept there; later solves only pass the column bounds that
+      changed. It is rebuilt if variables or constraints are added.
+      A caller that bounds a few variables for one solve lists them in
+      lp.bounded_variables, only those and the ones it bounded the solve
+      before are looked at; otherwise every column is.
+      Requires highspy.
+    """
+    name = 'HiGHSPersistent'
+
+    def __init__(self, mip=True, msg=False, timeLimit=None, **kwargs):
+        super().__init__(mip=mip, msg=msg, timeLimit=timeLimit, **kwargs)
+        self.models = {}
+
+    def available(self):
+        return highspy is not None
+
+    def actualSolve(self, lp, **kwargs):
+        if not self.available():
+            raise RuntimeError('highspy is not installed')
+        highs, variables, index, bounds, touched = self.load(lp)
+
+        # Only the columns whose bounds moved since the last solve are passed
+        bounded = getattr(lp, 'bounded_variables', None)
+        if bounded is None:
+            columns = range(len(variables))
+            touched.update(columns)
+        else:
+            current = {index[v.name] for v in bounded}
+            columns = touched | current
+            touched.clear()
+            touched.update(current)
+        inf = highspy.kHighsInf
+        for i in columns:
+            v = variables[i]
+            bound = (-inf if v.lowBound is None else v.lowBound, inf if v.upBound is None else v.upBound)
+            if bounds[i] != bound:
+                highs.changeColBounds(i, *bound)
+                bounds[i] = bound
+        highs.run()
+
+        model_status = highs.getModelStatus()
+        if model_status == highspy.HighsModelStatus.kOptimal:
+            status, solution_status = LpStatusOptimal, LpSolutionOptimal
+        elif model_status in (highspy.HighsModelStatus.kInfeasible, highspy.HighsModelStatus.kUnboundedOrInfeasible):
+            status, solution_status = LpStatusInfeasible, LpSolutionInfeasible
+        elif model_status == highspy.HighsModelStatus.kUnbounded:
+            status, solution_status = LpStatusUnbounded, LpSolutionUnbounded
+        else:
+            status, solution_status = LpStatusNotSolved, LpSolutionNoSolutionFound
+
+        if status == LpStatusOptimal:
+            for v, x in zip(variables, highs.getSolution().col_value):
+                v.varValue = x
+        lp.assignStatus(status, solution_status)
+        return status
+
+    def load(self, lp):
+        # (Highs, variables in column order, column by variable name, column
+        # bounds loaded, columns bounded by the last solve), built once per
+        # model structure. Adding a constraint or a variable changes its
+        # shape, lp.variables() is only walked to rebuild.
+        cached = self.models.get(id(lp))
+        if cached is not None and cached[0] == (len(lp.constraints), len(lp._variables)):
+            return cached[1:]
+        variables = lp.variables()
+        shape = (len(lp.constraints), len(lp._variables))
+
+        inf = highspy.kHighsInf
+        highs = highspy.Highs()
+        highs.setOptionValue('output_flag', bool(self.msg))
+        if self.timeLimit is not None:
+            highs.setOptionValue('time_limit', float(self.timeLimit))
+
+        sign = 1 if lp.sense == LpMinimize else -1
+        index = {}
+        bounds = []
+        for i, v in enumerate(variables):
+            bound = (-inf if v.lowBound is None else v.lowBound, inf if v.upBound is None else v.upBound)
+            highs.addCol(sign * lp.objective.get(v, 0.0), *bound, 0, [], [])
+            if self.mip and v.cat == LpInteger:
+                highs.changeColIntegrality(i, highspy.HighsVarType.kInteger)
+            index[v.name] = i
+            bounds.append(bound)
+        highs.changeObjectiveOffset(sign * lp.objective.constant)
+
+        for constraint in lp.constraints.values():
+            items = [(index[v.name], coefficient) for v, coefficient in constraint.items() if coefficient != 0]
+            indices, coefficients = zip(*items) if items else ((), ())
+            lb, ub = constraint.getLb(), constraint.getUb()
+            highs.addRow(-inf if lb is None else lb, inf if ub is None else ub, len(indices), indices, coefficients)
+
+        self.models[id(lp)] = (shape, highs, variables, index, bounds, set())
+        return self.models[id(lp)][1:]
+
+
+# Backends by name, any other name is looked up with pulp.getSolver.
+# 'auto' is HiGHS when highspy is installed and CBC otherwise. With
+# mip=False the integer variables are relaxed to continuous.
+def make_solver(name='auto', msg=False, mip=True):
+    if name == 'auto':
+        name = 'highs' if highspy is not None else 'cbc'
+    if name == 'highs':
+        return HiGHSPersistent(mip=mip, msg=msg)
+    if name == 'cbc':
+        return PULP_CBC_CMD(mip=mip, msg=msg)
+    return getSolver(name, mip=mip, msg=msg)
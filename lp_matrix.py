@@ -0,0 +1,80 @@
+from pulp import LpVariable, LpAffineExpression, LpConstraint, LpProblem, LpMinimize, LpContinuous, LpInteger
+import numpy as np
+
+
+class ModelMatrix:
+    """
+      A MILP stored in matrix form: one column per variable (bounds and
+      integrality) and the constraint matrix as (row, column, value)
+      triplets held in NumPy arrays. Triplets with the same (row, column)
+      are summed, as lpSum would do.
+    """
+    def __init__(self):
+        self.names = []
+        self.lowBounds = []
+        self.upBounds = []
+        self.integer = []
+        self.objective = {}
+        self.columns = {}
+        self.blocks = []
+        self.senses = []
+        self.rhs = []
+        self.num_rows = 0
+
+    @property
+    def num_cols(self):
+        return len(self.names)
+
+    def addVariables(self, name, shape, lowBound=None, upBound=None, integer=False, start=None):
+        # Same naming as LpVariable.dicts, e.g. X_0_1_0
+        start = start or [0] * len(shape)
+        indices = np.indices(shape).reshape(len(shape), -1).T + start if shape else np.zeros((1, 0), dtype=int)
+        cols = np.arange(self.num_cols, self.num_cols + len(indices))
+        self.names.extend('_'.join([name, *map(str, index)]) for index in indices.tolist())
+        self.lowBounds.extend([lowBound] * len(indices))
+        self.upBounds.extend([upBound] * len(indices))
+        self.integer.extend([integer] * len(indices))
+        self.columns[name] = cols.reshape(shape)
+        return self.columns[name]
+
+    def addRows(self, rows, cols, vals, sense, rhs):
+        # rows are numbered from 0 within the block, rhs has one entry per row
+        rhs = np.asarray(rhs, dtype=float).ravel()
+        rows, cols, vals = np.broadcast_arrays(np.asarray(rows), np.asarray(cols), np.asarray(vals, dtype=float))
+        self.blocks.append((rows.ravel() + self.num_rows, cols.ravel(), vals.ravel()))
+        self.senses.extend([sense] * len(rhs))
+        self.rhs.extend(rhs.tolist())
+        self.num_rows += len(rhs)
+
+    def triplets(self):
+        # Coalesce duplicates and drop zeros, sorted by row then column
+        rows = np.concatenate([block[0] for block in self.blocks])
+        cols = np.concatenate([block[1] for block in self.blocks])
+        vals = np.concatenate([block[2] for block in self.blocks])
+        keys, inverse = np.unique(rows * self.num_cols + cols, return_inverse=True)
+        vals = np.bincount(inverse, weights=vals)
+        nonzero = vals != 0
+        keys, vals = keys[nonzero], vals[nonzero]
+        return keys // self.num_cols, keys % self.num_cols, vals
+
+    def toLpProblem(self, name, sense=LpMinimize, objective_name=None):
+        variables = [
+            LpVariable(n, lb, ub, LpInteger if integer else LpContinuous)
+            for n, lb, ub, integer in zip(self.names, self.lowBounds, self.upBounds, self.integer)
+        ]
+
+        prob = LpProblem(name, sense)
+        prob += LpAffineExpression([(variables[col], val) for col, val in self.objective.items()]), objective_name
+
+        # Columns are registered once here rather than per row by addConstraint
+        rows, cols, vals = self.triplets()
+        prob.addVariables([variables[col] for col in np.unique(cols).tolist()])
+        starts = np.searchsorted(rows, np.arange(self.num_rows + 1)).tolist()
+        terms = list(zip([variables[col] for col in cols.tolist()], vals.tolist()))
+        for row in range(self.num_rows):
+            constraint = LpConstraint(terms[starts[row]:starts[row + 1]], self.senses[row], rhs=self.rhs[row])
+            name = prob.unusedConstraintName()
+            prob.constraints[name] = constraint
+            prob.modifiedConstraints.append(constraint)
+
+        return prob, variables
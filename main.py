@@ -1,5 +1,4 @@
 import sys, os, logging
-from pulp import PULP_CBC_CMD
 from qc_scheduling import QCScheduling
 from branch_and_bound import branch_and_bound_dfs
 from grasp import launch
@@ -37,27 +36,29 @@ early_stop = 50
 
 def displayResult(solution, filename):
     if solution:
+        status = solution.solve()
         if solution.lpModel is not None:
-            solution.lpModel.solve(PULP_CBC_CMD(msg=False))
             qcs.export(solution.lpModel, filename)
-        print(f'Best solution ({solution.status()}): {solution.objective()}')
+        print(f'Best solution ({status}): {solution.objective()}')
         print(solution)
     else:
         print('No solution found')
 
 def run_branch_and_bound():
     print('Running branch and bound...')
-    solution = branch_and_bound_dfs(qcs)
+    solution, _, stats = branch_and_bound_dfs(qcs)
+    print(stats)
     displayResult(solution, filename='branch_and_bound')
 
 def run_grasp():
     print('Running GRASP...')
-    solution = launch(qcs, r, early_stop)
+    solution, _, stats = launch(qcs, r, early_stop)
+    print(stats)
     displayResult(solution, filename='grasp')
 
 def exportSolution(solution, filename, dirname):
     if solution is not None and solution.lpModel is not None:
-        solution.lpModel.solve(PULP_CBC_CMD(msg=False))
+        solution.solve()
         qcs.export(solution.lpModel, filename, dirname)
 
 def process(dirname):
@@ -69,10 +70,12 @@ def process(dirname):
     if not os.path.exists(dirpath):
         os.makedirs(dirpath)
 
-    s1, r1 = branch_and_bound_dfs(qcs)
-    s2, r2 = launch(qcs, r, early_stop)
+    s1, r1, stats1 = branch_and_bound_dfs(qcs)
+    s2, r2, stats2 = launch(qcs, r, early_stop)
     exportSolution(s1, 'branch_and_bound', dirpath)
     exportSolution(s2, 'grasp', dirpath)
+    stats1.toJSON(os.path.join(dirpath, 'branch_and_bound_stats.json'))
+    stats2.toJSON(os.path.join(dirpath, 'grasp_stats.json'))
 
     with open(os.path.join(dirpath, 'output.txt'), 'w') as f:
         f.write(f'DATA INPUT {dirname}\n')
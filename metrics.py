@@ -0,0 +1,141 @@
+import os, json, functools
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+from time import time
+
+
+class SolverStats:
+    """
+      Counters, accumulated timers and gauges of one solver run. With
+      trace=True every timed section and gauge change is also kept as an
+      event, written in the Chrome trace format (chrome://tracing or
+      https://ui.perfetto.dev) by writeChromeTrace.
+    """
+    def __init__(self, name='solver', trace=False):
+        self.name = name
+        self.counters = defaultdict(int)
+        self.timers = defaultdict(float)
+        self.calls = defaultdict(int)
+        self.gauges = {}
+        self.values = {}
+        self.events = [] if trace else None
+        self.start_time = time()
+        self.run_time = None
+
+    def count(self, name, n=1):
+        self.counters[name] += n
+
+    def gauge(self, name, value):
+        # Keeps the last and the peak value
+        last, peak = self.gauges.get(name, (value, value))
+        self.gauges[name] = (value, max(peak, value))
+        if self.events is not None:
+            self.events.append({'name': name, 'ph': 'C', 'ts': time() * 1e6, 'pid': os.getpid(), 'args': {name: value}})
+
+    def set(self, name, value):
+        self.values[name] = value
+
+    @contextmanager
+    def timer(self, name):
+        start = time()
+        try:
+            yield
+        finally:
+            self.addTime(name, time() - start, start)
+
+    def addTime(self, name, seconds, start=None):
+        self.timers[name] += seconds
+        self.calls[name] += 1
+        if self.events is not None:
+            start = time() - seconds if start is None else start
+            self.events.append({'name': name, 'ph': 'X', 'ts': start * 1e6, 'dur': seconds * 1e6, 'pid': os.getpid(), 'tid': 0})
+
+    def stop(self):
+        self.run_time = time() - self.start_time
+        return self.run_time
+
+    def merge(self, other):
+        # Adds the counts and times of other, e.g. collected by a worker process
+        for name, n in other.counters.items():
+            self.counters[name] += n
+        for name, seconds in other.timers.items():
+            self.timers[name] += seconds
+        for name, n in other.calls.items():
+            self.calls[name] += n
+        for name, (last, peak) in other.gauges.items():
+            self.gauges[name] = (last, max(peak, self.gauges.get(name, (last, peak))[1]))
+        if self.events is not None and other.events is not None:
+            self.events.extend(other.events)
+
+    def __getitem__(self, name):
+        # Counter, value, or number of calls of a timer
+        if name in self.values:
+            return self.values[name]
+        if name in self.calls:
+            return self.calls[name]
+        return self.counters[name]
+
+    def toDict(self):
+        return {
+            'name': self.name,
+            'run_time': self.run_time,
+            'counters': dict(self.counters),
+            'timers': {name: {'calls': self.calls[name], 'seconds': seconds} for name, seconds in self.timers.items()},
+            'gauges': {name: {'last': last, 'peak': peak} for name, (last, peak) in self.gauges.items()},
+            'values': self.values,
+        }
+
+    def toJSON(self, path=None):
+        if path is None:
+            return json.dumps(self.toDict(), indent=2, default=str)
+        with open(path, 'w') as f:
+            json.dump(self.toDict(), f, indent=2, default=str)
+
+    def writeChromeTrace(self, path):
+        if self.events is None:
+            raise ValueError('Stats were collected without trace=True')
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': self.events, 'displayTimeUnit': 'ms'}, f)
+
+    def __str__(self):
+        timers = ', '.join(f'{name} {self.calls[name]}x {seconds:.3f}s' for name, seconds in sorted(self.timers.items()))
+        counters = ', '.join(f'{name} {n}' for name, n in sorted(self.counters.items()))
+        return f'{self.name}: {timers}; {counters}'
+
+
+# The stats being collected by the running solver. The model and the states
+# report to it through the functions below, which do nothing when no solver
+# is collecting.
+active = None
+
+@contextmanager
+def collecting(stats):
+    global active
+    previous, active = active, stats
+    try:
+        yield stats
+    finally:
+        active = previous
+
+def count(name, n=1):
+    if active is not None:
+        active.counters[name] += n
+
+def gauge(name, value):
+    if active is not None:
+        active.gauge(name, value)
+
+def timed(name):
+    return nullcontext() if active is None else active.timer(name)
+
+def timedFunction(name):
+    # Decorator timing the calls of a function as name
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if active is None:
+                return function(*args, **kwargs)
+            with active.timer(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,192 @@
+import logging
+import numpy as np
+from time import time
+import metrics
+from qc_scheduling import QCScheduling
+from grasp import local_search, variable_neighborhood_descent, verify_solution
+
+logger = logging.getLogger()
+
+# Re-planning while the vessel is being worked. Tasks are known by external
+# ids (any hashable), the plan is a list of task ids per QC and the first
+# committed[qc] tasks of each QC are done or in progress: they are never
+# moved again. Deltas (new or removed tasks, duration changes, broken-down
+# QCs) only change the instance, replan then repairs the open part of the
+# previous plan instead of solving from scratch.
+
+REPLAN_DEADLINE = 5
+# Restarts without improvement after which replan stops before the deadline
+REPLAN_PATIENCE = 20
+
+
+class OnlineScheduler:
+    """
+      Keeps the current instance and plan of a vessel, applies deltas to
+      them and repairs the plan with the GRASP construction and
+      neighborhoods, keeping the executed prefix of every QC fixed.
+    """
+    def __init__(self, durations, bays, qc_locations, non_simultaneous=(), precedences=(), plan=None):
+        # durations and bays: task id -> value; pairs are of task ids
+        self.durations = dict(durations)
+        self.bays = dict(bays)
+        self.qc_locations = list(qc_locations)
+        self.non_simultaneous = {tuple(pair) for pair in non_simultaneous}
+        self.precedences = {tuple(pair) for pair in precedences}
+        self.available = [True] * len(self.qc_locations)
+        self.plan = [list(tasks) for tasks in plan] if plan is not None else [[] for _ in self.qc_locations]
+        self.committed = [0] * len(self.qc_locations)
+        self.makespan = None
+
+    @classmethod
+    def fromSchedule(cls, qcs, schedule):
+        # Online view of a solved instance, task ids are the 1-based task
+        # numbers of the instance
+        durations = {task + 1: d for task, d in enumerate(qcs.task_durations)}
+        bays = {task + 1: bay for task, bay in enumerate(qcs.task_locations)}
+        plan = [[task + 1 for task in tasks] for tasks in schedule]
+        return cls(durations, bays, qcs.qc_locations, qcs.non_simultaneous_tasks, qcs.precedence_constrained_tasks, plan)
+
+    def commit(self, qc, count):
+        # The first count tasks of qc's plan are done or in progress
+        if not self.committed[qc] <= count <= len(self.plan[qc]):
+            raise ValueError(f'QC {qc} has {len(self.plan[qc])} planned tasks, {self.committed[qc]} committed')
+        self.committed[qc] = count
+
+    def isCommitted(self, task):
+        return any(task in tasks[:n] for tasks, n in zip(self.plan, self.committed))
+
+    def addTask(self, task, duration, bay, non_simultaneous=(), predecessors=(), successors=()):
+        if task in self.durations:
+            raise ValueError(f'Task {task} already exists')
+        self.durations[task] = duration
+        self.bays[task] = bay
+        self.non_simultaneous |= {(task, other) for other in non_simultaneous}
+        self.precedences |= {(other, task) for other in predecessors} | {(task, other) for other in successors}
+
+    def removeTask(self, task):
+        if self.isCommitted(task):
+            raise ValueError(f'Task {task} is already committed')
+        del self.durations[task]
+        del self.bays[task]
+        self.non_simultaneous = {pair for pair in self.non_simultaneous if task not in pair}
+        self.precedences = {pair for pair in self.precedences if task not in pair}
+        self.plan = [[t for t in tasks if t != task] for tasks in self.plan]
+
+    def changeDuration(self, task, duration):
+        # Also allowed for committed tasks, e.g. one in progress running late
+        if task not in self.durations:
+            raise ValueError(f'Unknown task {task}')
+        self.durations[task] = duration
+
+    def setUnavailable(self, qc):
+        # The QC keeps its committed tasks but takes no new ones
+        self.available[qc] = False
+
+    def setAvailable(self, qc):
+        self.available[qc] = True
+
+    def buildInstance(self):
+        # (QCScheduling, task ids in index order, index by task id)
+        ids = list(self.durations)
+        index = {task: i for i, task in enumerate(ids)}
+        pairs = lambda pairs: {(index[i] + 1, index[j] + 1) for i, j in pairs}
+        qcs = QCScheduling(len(ids), len(self.qc_locations), [self.durations[t] for t in ids], [self.bays[t] for t in ids],
+                           self.qc_locations, pairs(self.non_simultaneous), pairs(self.precedences))
+
+        # A broken-down QC takes no task, the tasks only it could reach go to
+        # the nearest available QC on each side
+        if not any(self.available):
+            raise ValueError('No QC is available')
+        for qc, available in enumerate(self.available):
+            if not available:
+                qcs.qc_reach[qc] = 0
+        for task in range(qcs.num_tasks):
+            reach = tuple(qc for qc in qcs.task_reach[task] if self.available[qc])
+            if not reach:
+                bay = qcs.task_locations[task]
+                left = [qc for qc in range(qcs.num_qcs) if self.available[qc] and qcs.qc_locations[qc] <= bay]
+                right = [qc for qc in range(qcs.num_qcs) if self.available[qc] and qcs.qc_locations[qc] > bay]
+                nearest = set()
+                if left:
+                    nearest.add(max(left, key=lambda qc: qcs.qc_locations[qc]))
+                if right:
+                    nearest.add(min(right, key=lambda qc: qcs.qc_locations[qc]))
+                reach = tuple(sorted(nearest))
+                for qc in reach:
+                    qcs.qc_reach[qc] |= 1 << task
+            qcs.task_reach[task] = reach
+        return qcs, ids, index
+
+    def repairState(self, qcs, index):
+        # Committed prefixes, then the previous plan of the available QCs
+        # where it is still valid; the remaining tasks are left open
+        state = qcs.getStartState(False)
+        for qc, tasks in enumerate(self.plan):
+            for task in tasks[:self.committed[qc]]:
+                state = state.result((qc, index[task]), qcs)
+        for qc, tasks in enumerate(self.plan):
+            for task in tasks[self.committed[qc]:]:
+                action = (qc, index[task])
+                if qcs.qc_reach[qc] >> action[1] & 1 and not qcs.actionViolateConstraint8(state, action):
+                    state = state.result(action, qcs)
+        return state
+
+    def replan(self, alpha=0.4, early_stop=50, vnd=True, deadline=REPLAN_DEADLINE, patience=REPLAN_PATIENCE, seed=None, verify=False, stats=None):
+        # Repairs the plan within deadline seconds. The previous plan with the
+        # open tasks inserted greedily is improved first, then randomized
+        # completions of the committed prefixes are tried until the
+        # deadline or patience restarts in a row without improvement.
+        # Returns (plan, run_time, stats), the plan is also kept.
+        stats = metrics.SolverStats('online') if stats is None else stats
+        rng = np.random.default_rng(seed)
+        with metrics.collecting(stats):
+            with metrics.timed('model_build'):
+                qcs, ids, index = self.buildInstance()
+            fixed = tuple(self.committed)
+            prefix = qcs.getScheduleState([[index[task] for task in tasks[:n]] for tasks, n in zip(self.plan, fixed)], False)
+
+            best, best_cost = None, float('inf')
+            start = self.repairState(qcs, index)
+            iteration = idle = 0
+            while time() - stats.start_time < deadline and idle <= patience:
+                sol = self.complete(qcs, start if iteration == 0 else prefix, 1.0 if iteration == 0 else alpha, rng)
+                iteration += 1
+                idle += 1
+                if sol is None:
+                    metrics.count('construction_failures')
+                    continue
+                sol.evaluate(qcs)
+                remaining = deadline - (time() - stats.start_time)
+                if vnd:
+                    with metrics.timed('vnd'):
+                        sol = variable_neighborhood_descent(sol, qcs, fixed, remaining)
+                else:
+                    with metrics.timed('local_search'):
+                        sol = local_search(sol, early_stop, qcs, rng, fixed, remaining)
+                if sol.objective() < best_cost and sol.evaluate(qcs):
+                    best, best_cost = sol, sol.objective()
+                    idle = 0
+                    metrics.count('improvements')
+                    logger.info('Online repair: %s after %.3fs', best_cost, time() - stats.start_time)
+
+            if verify:
+                best = verify_solution(best, qcs)
+            stats.set('iterations', iteration)
+            stats.set('objective', best_cost if best is not None else None)
+        run_time = stats.stop()
+
+        if best is None:
+            logger.info('Online repair found no feasible plan in %.3fs', run_time)
+            return None, run_time, stats
+        self.plan = [[ids[task] for task in tasks] for tasks in best.qc_assigned_tasks]
+        self.makespan = best_cost
+        return self.plan, run_time, stats
+
+    @staticmethod
+    def complete(qcs, state, alpha, rng):
+        # Assigns the open tasks with the GRASP construction
+        while not qcs.isGoalState(state):
+            state = qcs.expandGrasp(state, alpha, rng)
+            if state is None:
+                return None
+        return state
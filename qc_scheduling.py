@@ -1,22 +1,51 @@
 from pulp import *
 from search import SearchProblem
+from lp_matrix import ModelMatrix
+from lp_backend import make_solver
+from util import iterBits, LRUCache
+import metrics
 import csv
 import os
+import itertools
 import numpy as np
 
 
 class QCState:
+    __slots__ = ('qc_assigned_tasks', 'mask', '_hash', 'qc_completion_time', 'lc', 'lpModel', 'bounds', 'task_completion_time', 'lp_status', 'lp_objective', 'lp_relaxation', 'arrays')
+
     def __init__(self, num_qcs, init_locations, lpModel = None):
-        self.qc_assigned_tasks = [[] for _ in range(num_qcs)]
+        self.setAssignedTasks(((),) * num_qcs, 0)
         self.qc_completion_time = [0] * num_qcs
         self.lc = init_locations
         self.lpModel = lpModel
+        self.bounds = ()
+        self.task_completion_time = {}
+        self.lp_status = None
+        self.lp_objective = None
+        self.lp_relaxation = None
+        self.arrays = None
+
+    def setAssignedTasks(self, qc_assigned_tasks, mask=None):
+        # Per-QC sequences are tuples so that the bitmask of assigned tasks
+        # and the hash can be computed once
+        self.qc_assigned_tasks = qc_assigned_tasks
+        if mask is None:
+            mask = 0
+            for task in itertools.chain.from_iterable(qc_assigned_tasks):
+                mask |= 1 << task
+        self.mask = mask
+        self._hash = hash(qc_assigned_tasks)
+        self.arrays = None
+
+    def setQCTasks(self, qc, tasks, mask=None):
+        assigned = self.qc_assigned_tasks
+        self.setAssignedTasks(assigned[:qc] + (tuple(tasks),) + assigned[qc + 1:], mask)
 
     def __eq__(self, other):
-        return self.qc_assigned_tasks == other.qc_assigned_tasks
+        return self._hash == other._hash and self.qc_assigned_tasks == other.qc_assigned_tasks
 
     def __hash__(self):
-        return hash(str(self.qc_assigned_tasks))
+        return self._hash
     
     def __str__(self):
         result = []
@@ -26,10 +55,7 @@ class QCState:
         return "\n".join(result)
     
     def match(self, other):
-        task1 = self.assigned_tasks()
-        task2 = other.assigned_tasks()
-
-        return len(task1) == len(task2) and set(task1) == set(task2)
+        return self.mask == other.mask
 
     def dominate(self, other):
         strictly = False
@@ -41,40 +67,60 @@ class QCState:
         return strictly
     
     def assigned_tasks(self):
-        return sum(self.qc_assigned_tasks, [])
+        return list(itertools.chain.from_iterable(self.qc_assigned_tasks))
     
     def clone(self):
-        model = None if self.lpModel is None else self.lpModel.copy()
-        cloned_state = QCState(len(self.qc_assigned_tasks), self.lc.copy(), model)
-        cloned_state.qc_assigned_tasks = [tasks.copy() for tasks in self.qc_assigned_tasks]
+        # The model, the bounds and the task sequences are immutable or
+        # shared, only the mutable timing data is copied
+        metrics.count('clones')
+        cloned_state = QCState.__new__(QCState)
+        cloned_state.qc_assigned_tasks = self.qc_assigned_tasks
+        cloned_state.mask = self.mask
+        cloned_state._hash = self._hash
+        cloned_state.lc = self.lc.copy()
+        cloned_state.lpModel = self.lpModel
+        cloned_state.bounds = self.bounds
+        cloned_state.lp_status = self.lp_status
+        cloned_state.lp_objective = self.lp_objective
+        cloned_state.lp_relaxation = self.lp_relaxation
         cloned_state.qc_completion_time = self.qc_completion_time.copy()
+        cloned_state.task_completion_time = self.task_completion_time.copy()
+        # Never written in place, shared until the timing changes
+        cloned_state.arrays = self.arrays
         return cloned_state
     
     def objective(self):
         return max(self.qc_completion_time)
     
+    def addBound(self, var, lowBound=None, upBound=None):
+        if self.lpModel is None: return
+        self.bounds += ((var, lowBound, upBound),)
+        self.lp_status = self.lp_objective = self.lp_relaxation = None
+
     def addConstraint3(self, task, qc, qcs):
         if self.lpModel is None: return
-        self.lpModel += qcs.Xijk[0][task + 1][qc] == 1
+        self.addBound(qcs.Xijk[0][task + 1][qc], lowBound=1)
     
     def addConstraint4(self, task_i, task_j, qc, qcs):
         if self.lpModel is None: return
-        self.lpModel += qcs.Xijk[task_i + 1][task_j + 1][qc] == 1
-        self.lpModel += qcs.Zij[task_i][task_j] == 1
+        self.addBound(qcs.Xijk[task_i + 1][task_j + 1][qc], lowBound=1)
+        self.addBound(qcs.Zij[task_i][task_j], lowBound=1)
     
     def addConstraintYk(self, qc, completion_time, qcs):
         if self.lpModel is None: return
-        self.lpModel += qcs.Yk[qc] >= completion_time
+        self.addBound(qcs.Yk[qc], lowBound=completion_time)
 
     def addConstraintDi(self, task, completion_time, qcs):
         if self.lpModel is None: return
-        self.lpModel += qcs.Di[task] >= completion_time
+        self.addBound(qcs.Di[task], lowBound=completion_time)
     
     def result(self, action, qcs):
+        metrics.count('states')
         qc, task = action
         next_state = self.clone()
-        next_state.qc_assigned_tasks[qc].append(task)
+        next_state.setQCTasks(qc, self.qc_assigned_tasks[qc] + (task,), self.mask | 1 << task)
         next_state.qc_completion_time[qc] += qcs.task_durations[task]
+        next_state.task_completion_time[task] = next_state.qc_completion_time[qc]
         next_state.lc[qc] = qcs.task_locations[task]
 
         # Set decision variables
@@ -88,8 +134,12 @@ class QCState:
 
         return next_state
     
+    @metrics.timedFunction('evaluate_grasp')
     def evaluateGrasp(self, qcs):
-        self.lpModel = qcs.initModel()
+        self.lpModel = qcs.getModel()
+        self.bounds = ()
+        self.lp_status = self.lp_objective = self.lp_relaxation = None
+        self.arrays = None
         grasp_ck = [0] * len(self.qc_completion_time)
         for qc, tasks in enumerate(self.qc_assigned_tasks):
             lc = qcs.qc_locations[qc]
@@ -111,14 +161,162 @@ class QCState:
 
             self.addConstraintYk(qc, yk, qcs)
             grasp_ck[qc] = ck
-            self.lc[qc] = qcs.task_locations[tasks[-1]]
+            if tasks:
+                self.lc[qc] = qcs.task_locations[tasks[-1]]
         self.qc_completion_time = grasp_ck
+
+    def evaluate(self, qcs):
+        # Same timing as evaluateGrasp but without building the MILP:
+        # returns whether constraints (8), (10) and (11) hold
+        grasp_ck = [0] * len(self.qc_completion_time)
+        self.task_completion_time = {}
+        self.arrays = None
+        for qc, tasks in enumerate(self.qc_assigned_tasks):
+            ck = 0
+            for task in tasks:
+                ck += qcs.task_durations[task]
+                self.task_completion_time[task] = ck
+            grasp_ck[qc] = ck
+            if tasks:
+                self.lc[qc] = qcs.task_locations[tasks[-1]]
+        self.qc_completion_time = grasp_ck
+        return qcs.countViolations(self) == 0
+
+    def evaluateMove(self, qcs, move):
+        # Makespan and violation deltas of giving the QCs in move (QC -> task
+        # sequence) new sequences, without touching the state. Only the
+        # sequences of the moved QCs are timed again and only the pairs
+        # involving a task whose completion time or QC changes are re-checked.
+        ck = list(self.qc_completion_time)
+        changed, changed_D, changed_qc = [], [], []
+        for qc, tasks in move.items():
+            completion_time = 0
+            kept = set(self.qc_assigned_tasks[qc])
+            for task in tasks:
+                completion_time += qcs.task_durations[task]
+                if task not in kept or self.task_completion_time[task] != completion_time:
+                    changed.append(task)
+                    changed_D.append(completion_time)
+                    changed_qc.append(qc)
+            ck[qc] = completion_time
+
+        delta_makespan = max(ck) - max(self.qc_completion_time)
+        if not changed:
+            return delta_makespan, 0
+        D, qc_of, violated = qcs.scheduleArrays(self)
+        new_D, new_qc_of = D.copy(), qc_of.copy()
+        new_D[changed] = changed_D
+        new_qc_of[changed] = changed_qc
+        if len(changed) > qcs.num_tasks * qcs.INCIDENT_SHARE:
+            # Most pairs involve a changed task, selecting them costs more
+            # than checking them all
+            delta_violations = np.count_nonzero(qcs.violatedPairs(new_D, new_qc_of)) - np.count_nonzero(violated)
+        else:
+            selected = qcs.incidentPairs(changed)
+            delta_violations = np.count_nonzero(qcs.violatedPairs(new_D, new_qc_of, selected)) - np.count_nonzero(violated[selected])
+        return delta_makespan, int(delta_violations)
+
+    def applyMove(self, qcs, move):
+        # Materialize an accepted move as a new state
+        state = self.clone()
+        for qc, tasks in move.items():
+            state.setQCTasks(qc, tasks, self.mask)
+        state.evaluate(qcs)
+        return state
     
-    def status(self):
+    def status(self, relaxed=False):
+        # Status of this state's MILP, or of its LP relaxation, solved once
+        # per set of bounds
         if self.lpModel is None: return 'Optimal'
+        if relaxed:
+            if self.lp_relaxation is None:
+                self.loadResult(True)
+            return self.lp_relaxation[0]
+        if self.lp_status is None:
+            self.loadResult()
+        else:
+            metrics.count('lp_solves_cached')
+        return self.lp_status
 
-        self.lpModel.solve(PULP_CBC_CMD(msg=False))
-        return LpStatus[self.lpModel.status]
+    def lpObjective(self, relaxed=False):
+        # Objective value of this state's MILP, or of its LP relaxation
+        if self.lpModel is None:
+            return None
+        if relaxed:
+            if self.lp_relaxation is None:
+                self.loadResult(True)
+            return self.lp_relaxation[1]
+        if self.lp_status is None:
+            self.loadResult()
+        return self.lp_objective
+
+    def boundsKey(self):
+        # The bounds as applied by solve, one (lowBound, upBound) per
+        # variable, so that states reached in different ways share a key
+        applied = {}
+        for var, lowBound, upBound in self.bounds:
+            low, up = applied.get(var.name, (None, None))
+            if lowBound is not None:
+                low = lowBound if low is None else max(low, lowBound)
+            if upBound is not None:
+                up = upBound if up is None else min(up, upBound)
+            applied[var.name] = (low, up)
+        return frozenset(applied.items())
+
+    def loadResult(self, relaxed=False):
+        # Status and objective from the solve cache of the model, or solved.
+        # Entries are keyed by model ('milp' or 'lp') and bounds.
+        cache = getattr(self.lpModel, 'solve_cache', None)
+        result = cache.get(('lp' if relaxed else 'milp', self.boundsKey())) if cache is not None else None
+        if result is None:
+            self.solve(relaxed)
+        else:
+            metrics.count('lp_cache_hits')
+            if relaxed:
+                self.lp_relaxation = result
+            else:
+                self.lp_status, self.lp_objective = result
+
+    @metrics.timedFunction('lp_solve')
+    def solve(self, relaxed=False):
+        # Solve this state's MILP, or its LP relaxation with the relaxed
+        # solver of the model, leaving the solution in the variables of the
+        # model (e.g. to export it). A MILP solve is skipped when the model
+        # still holds its solution from the last solve.
+        if self.lpModel is None: return 'Optimal'
+        if not relaxed and self.lp_status is not None and getattr(self.lpModel, 'solved_bounds', None) is self.bounds:
+            return self.lp_status
+
+        # The model is shared by every state: apply this state's decisions
+        # as variable bounds for the duration of the solve only. A
+        # persistent backend only looks at the variables listed in
+        # bounded_variables (see lp_backend.HiGHSPersistent).
+        saved = [(var, var.lowBound, var.upBound) for var, _, _ in self.bounds]
+        for var, lowBound, upBound in self.bounds:
+            if lowBound is not None:
+                var.lowBound = lowBound if var.lowBound is None else max(var.lowBound, lowBound)
+            if upBound is not None:
+                var.upBound = upBound if var.upBound is None else min(var.upBound, upBound)
+        self.lpModel.bounded_variables = [var for var, _, _ in saved]
+        try:
+            self.lpModel.solve(self.lpModel.relaxed_solver if relaxed else None)
+        finally:
+            self.lpModel.bounded_variables = None
+            for var, lowBound, upBound in reversed(saved):
+                var.lowBound = lowBound
+                var.upBound = upBound
+        result = (LpStatus[self.lpModel.status], value(self.lpModel.objective))
+        if relaxed:
+            metrics.count('lp_relaxations')
+            self.lpModel.solved_bounds = None
+            self.lp_relaxation = result
+        else:
+            self.lpModel.solved_bounds = self.bounds
+            self.lp_status, self.lp_objective = result
+        cache = getattr(self.lpModel, 'solve_cache', None)
+        if cache is not None:
+            cache.put(('lp' if relaxed else 'milp', self.boundsKey()), result)
+        return result[0]
 
 
     def isFeasible(self):
@@ -132,8 +330,22 @@ class QCScheduling(SearchProblem):
     M = 9999
     ALPHA1 = 1
     ALPHA2 = 0.01
-
-    def __init__(self, num_tasks, num_qcs, task_durations, task_locations, qc_locations, non_simultaneous_tasks = {}, precedence_constrained_tasks = {}):
+    # Families combined by computeLowBound: 'workload', 'reach', 'precedence', 'bay'
+    LOW_BOUNDS = ('workload',)
+    # LP backend, see lp_backend.make_solver
+    SOLVER = 'auto'
+    # How search nodes are evaluated before the goal, see evaluateNode
+    NODE_EVALUATIONS = ('milp', 'lp', 'combinatorial')
+    NODE_EVALUATION = 'milp'
+    # Entries of the LRU cache of solve results, 0 to disable it
+    CACHE_SIZE = 10000
+    # Entries of the LRU cache of lower bound terms by remaining tasks
+    BOUND_CACHE_SIZE = 100000
+    # Share of the tasks above which evaluateMove re-checks all pairs
+    # rather than selecting the ones involving a changed task
+    INCIDENT_SHARE = 0.1
+
+    def __init__(self, num_tasks, num_qcs, task_durations, task_locations, qc_locations, non_simultaneous_tasks = {}, precedence_constrained_tasks = {}, low_bounds = None, solver = None, cache_size = None, node_evaluation = None):
         self.num_tasks = num_tasks
         self.num_qcs = num_qcs
         self.task_durations = task_durations
@@ -142,47 +354,102 @@ class QCScheduling(SearchProblem):
         self.non_simultaneous_tasks = non_simultaneous_tasks
         self.precedence_constrained_tasks = precedence_constrained_tasks
         self.num_ship_bays = max(task_locations)
+        self.full_mask = (1 << num_tasks) - 1
+        self.lpModel = None
+        self.solver = self.SOLVER if solver is None else solver
+        self.node_evaluation = self.NODE_EVALUATION if node_evaluation is None else node_evaluation
+        if self.node_evaluation not in self.NODE_EVALUATIONS:
+            raise ValueError(f'Unknown node evaluation {self.node_evaluation}, expected one of {self.NODE_EVALUATIONS}')
+        # Solve results by canonical bound set, shared by all the states of
+        # this instance
+        self.solve_cache = LRUCache(self.CACHE_SIZE if cache_size is None else cache_size)
+
+        # Index arrays used by countViolations (pairs are 0-based)
+        self.durations = np.array(task_durations, dtype=float)
+        self.phi_pairs = self.pairArray([(i - 1, j - 1) for i, j in precedence_constrained_tasks])
+        self.psi_pairs = self.pairArray([(i - 1, j - 1) for i, j in non_simultaneous_tasks])
+        self.crossing_pairs = self.pairArray([(i, j) for i in range(num_tasks) for j in range(num_tasks) if task_locations[i] < task_locations[j]])
+        # Position of each QC in bay order, QC indices need not follow it.
+        # The extra last entry is the rank of qc_of -1 (unassigned).
+        self.qc_rank = np.append(np.argsort(np.argsort(qc_locations, kind='stable'), kind='stable'), -1)
+        # Row i of incident_pairs flags the pairs of all_pairs involving task
+        # i, all_pairs being the PHI, PSI and crossing pairs back to back
+        self.all_pairs = np.concatenate((self.phi_pairs, self.psi_pairs, self.crossing_pairs), axis=1)
+        self.pair_splits = np.cumsum((self.phi_pairs.shape[1], self.psi_pairs.shape[1]))
+        self.incident_pairs = np.zeros((num_tasks, self.all_pairs.shape[1]), dtype=bool)
+        columns = np.arange(self.all_pairs.shape[1])
+        self.incident_pairs[self.all_pairs[0], columns] = True
+        self.incident_pairs[self.all_pairs[1], columns] = True
+
+        # Lower bound data, memoized by set of remaining tasks
+        self.low_bounds = self.LOW_BOUNDS if low_bounds is None else tuple(low_bounds)
+        self.bound_cache = LRUCache(self.BOUND_CACHE_SIZE)
+        self.task_reach = [tuple(qc for qc in range(num_qcs) if self.isReachable(qc, task)) for task in range(num_tasks)]
+
+        # PHI as adjacency lists (0-based)
+        self.predecessors = [[] for _ in range(num_tasks)]
+        self.successors = [[] for _ in range(num_tasks)]
+        for i, j in precedence_constrained_tasks:
+            self.predecessors[j - 1].append(i - 1)
+            self.successors[i - 1].append(j - 1)
+        self.predecessor_masks = [sum(1 << i for i in predecessors) for predecessors in self.predecessors]
+
+        # Bitmask of the tasks within each QC's bay window
+        self.qc_reach = [0] * num_qcs
+        for task, qcs in enumerate(self.task_reach):
+            for qc in qcs:
+                self.qc_reach[qc] |= 1 << task
+
+    @staticmethod
+    def pairArray(pairs):
+        return np.array(pairs, dtype=int).reshape(-1, 2).T
+
+    def incidentPairs(self, tasks):
+        # Indices in all_pairs of the pairs involving one of tasks
+        return np.logical_or.reduce(self.incident_pairs[tasks]).nonzero()[0]
     
     def getStartState(self, model=True):
-        model = self.initModel() if model else None
+        model = self.getModel() if model else None
         return QCState(self.num_qcs, self.qc_locations, model)
     
     def isGoalState(self, state):
-        return len(state.assigned_tasks()) == self.num_tasks
+        return state.mask == self.full_mask
     
     def expand(self, state):
+        metrics.count('expansions')
         for action in self.getActions(state):
             next_state = self.getNextState(state, action)
             yield (next_state, action, self.getActionCost(state, action, next_state))
     
     def getActions(self, state):
-        remaining_tasks = set(range(self.num_tasks)).difference(state.assigned_tasks())
+        remaining = self.full_mask & ~state.mask
         valid_actions = []
         for qc in state.getSortedQC():
-            for task in remaining_tasks:
-                if abs(self.qc_locations[qc] - self.task_locations[task]) >= (self.num_ship_bays * 1.0 / self.num_qcs):
-                    continue
+            for task in iterBits(self.qc_reach[qc] & remaining):
                 # Violate constraint 8
                 if self.actionViolateConstraint8(state, (qc, task)):
                     continue
                 valid_actions.append((qc, task))
         return valid_actions
+
+    def isReachable(self, qc, task):
+        # Each QC only works within a window of bays around its position
+        return abs(self.qc_locations[qc] - self.task_locations[task]) < (self.num_ship_bays * 1.0 / self.num_qcs)
     
     def actionViolateConstraint8(self, state, action):
+        # Pairs not involving task were checked when their second task was
+        # assigned, so only the PHI neighbours of task are looked at
         qc, task = action
-        task_completion_time_map = self.getTaskCompletionTime(state)
-        task_completion_time_map[task] = state.qc_completion_time[qc] + self.task_durations[task]
+        task_completion_time_map = state.task_completion_time
+        D = state.qc_completion_time[qc] + self.task_durations[task]
 
-        for task_i, task_j in self.precedence_constrained_tasks:
-            i, j = task_i - 1, task_j - 1
-            if i not in task_completion_time_map or j not in task_completion_time_map:
-                continue
-            
-            Di = task_completion_time_map[i]
-            Dj = task_completion_time_map[j]
-            if Di + self.task_durations[j] > Dj:
+        for i in self.predecessors[task]:
+            if i in task_completion_time_map and task_completion_time_map[i] + self.task_durations[task] > D:
                 return True
-            
+        for j in self.successors[task]:
+            if j in task_completion_time_map and D + self.task_durations[j] > task_completion_time_map[j]:
+                return True
+
         return False
     
     def getActionCost(self, state, action, next_state):
@@ -191,6 +458,113 @@ class QCScheduling(SearchProblem):
     def getNextState(self, state, action):
         return state.result(action, self)
     
+    def __getstate__(self):
+        # Worker processes rebuild the model on demand instead of receiving it
+        state = self.__dict__.copy()
+        for name in ('Xijk', 'Zij', 'Yk', 'Di', 'C'):
+            state.pop(name, None)
+        state['lpModel'] = None
+        state['solve_cache'] = LRUCache(self.solve_cache.maxsize)
+        return state
+
+    def getScheduleState(self, schedule, model=True):
+        # State reached by assigning each QC's tasks of schedule in order
+        state = self.getStartState(model)
+        for qc, tasks in enumerate(schedule):
+            for task in tasks:
+                state = state.result((qc, task), self)
+        return state
+
+    def getModel(self):
+        # The base model is built once, states only carry bound changes
+        if self.lpModel is None:
+            self.lpModel = self.initMatrixModel()
+            self.lpModel.solver = make_solver(self.solver)
+            self.lpModel.relaxed_solver = make_solver(self.solver, mip=False)
+            self.lpModel.solve_cache = self.solve_cache
+        return self.lpModel
+
+    @metrics.timedFunction('model_build')
+    def initMatrixModel(self):
+        # Same model as initModel, assembled from NumPy triplets
+        N, K = self.num_tasks, self.num_qcs
+        matrix = self.initMatrix()
+        prob, variables = matrix.toLpProblem("QCScheduling", LpMinimize, "Max_Makespan")
+
+        X, Z, Y, D, C = [matrix.columns[name] for name in 'XZYDC']
+        self.Xijk = {i: {j + 1: {k: variables[X[i, j, k]] for k in range(K)} for j in range(N + 1)} for i in range(N + 1)}
+        self.Zij = {i: {j: variables[Z[i, j]] for j in range(N)} for i in range(N)}
+        self.Yk = {k: variables[Y[k]] for k in range(K)}
+        self.Di = {i: variables[D[i]] for i in range(N)}
+        self.C = variables[C]
+        return prob
+
+    def initMatrix(self):
+        N, K = self.num_tasks, self.num_qcs
+        P = self.durations
+        matrix = ModelMatrix()
+
+        # Define variables, X[i, j - 1, k] is the column of Xijk
+        X = matrix.addVariables("X", (N + 1, N + 1, K), 0, 1, True, start=(0, 1, 0))
+        Z = matrix.addVariables("Z", (N, N), 0, 1, True)
+        Y = matrix.addVariables("Y", (K,), lowBound=0)
+        D = matrix.addVariables("D", (N,), lowBound=0)
+        C = matrix.addVariables("C", ())
+        # H[j] = sum_Xujv, shared by every row of (11)
+        H = matrix.addVariables("H", (N,))
+
+        # Objective function (1)
+        matrix.objective = {int(C): self.ALPHA1, **{int(y): self.ALPHA2 for y in Y}}
+
+        # (2)
+        rows = np.arange(K)[:, None]
+        matrix.addRows(rows, np.stack([np.full(K, C), Y], axis=1), [1, -1], LpConstraintGE, np.zeros(K))
+
+        # (3) & (4)
+        matrix.addRows(rows, X[0, :N, :].T, 1, LpConstraintEQ, np.ones(K))
+        matrix.addRows(rows, X[1:, N, :].T, 1, LpConstraintEQ, np.ones(K))
+
+        # (5)
+        rows = np.arange(N)[:, None]
+        X_in = X[1:, :N, :].transpose(1, 0, 2).reshape(N, N * K)
+        matrix.addRows(rows, X_in, 1, LpConstraintEQ, np.ones(N))
+
+        # (6)
+        rows = np.arange(K * N)[:, None]
+        X_ij = X[1:, :N, :].transpose(2, 0, 1).reshape(K * N, N)
+        X_ji = X[1:, :N, :].transpose(2, 1, 0).reshape(K * N, N)
+        matrix.addRows(rows, np.hstack([X_ij, X_ji]), np.repeat([1, -1], N), LpConstraintEQ, np.zeros(K * N))
+
+        # (8)
+        i, j = self.phi_pairs
+        rows = np.arange(len(i))[:, None]
+        matrix.addRows(rows, np.stack([D[i], D[j]], axis=1), [1, -1], LpConstraintLE, -P[j])
+
+        # (9)
+        i, j = np.nonzero(~np.eye(N, dtype=bool))
+        rows = np.arange(len(i))[:, None]
+        matrix.addRows(rows, np.stack([D[i], D[j], Z[i, j]], axis=1), [1, -1, self.M], LpConstraintLE, self.M - P[j])
+
+        # (10)
+        i, j = self.psi_pairs
+        rows = np.arange(len(i))[:, None]
+        matrix.addRows(rows, np.stack([Z[i, j], Z[j, i]], axis=1), 1, LpConstraintEQ, np.ones(len(i)))
+
+        # (11) sum_Xujv - sum_Xuiv <= M(Zij + Zji), once instead of once per k
+        rows = np.arange(N)[:, None]
+        matrix.addRows(rows, np.hstack([H[:, None], X_in]), np.repeat([1, -1], [1, N * K]), LpConstraintEQ, np.zeros(N))
+        i, j = self.crossing_pairs
+        rows = np.arange(len(i))[:, None]
+        matrix.addRows(rows, np.stack([H[j], H[i], Z[i, j], Z[j, i]], axis=1), [1, -1, -self.M, -self.M], LpConstraintLE, np.zeros(len(i)))
+
+        # (12)
+        k, j = np.divmod(np.arange(K * N), N)
+        rows = np.arange(K * N)[:, None]
+        matrix.addRows(rows, np.stack([D[j], Y[k], X[j + 1, N, k]], axis=1), [1, -1, self.M], LpConstraintLE, np.full(K * N, self.M))
+
+        return matrix
+
+    @metrics.timedFunction('model_build')
     def initModel(self):
         TASKS = range(self.num_tasks)
         QCS = range(self.num_qcs)
@@ -446,8 +820,24 @@ class QCScheduling(SearchProblem):
             for v in prob.variables():
                 writer.writerow([v.name, value(v)])    
 
+    def evaluateNode(self, state):
+        # (status, objective) a search node is pruned on. Goal states and
+        # every node with node_evaluation 'milp' solve the MILP; otherwise
+        # 'lp' solves its LP relaxation and 'combinatorial' bounds the
+        # objective with computeLowBound and the total workload, no LP
+        # involved. The no-wait violations of countViolations are not checked:
+        # the MILP may delay tasks to avoid them, so they do not make a node
+        # infeasible.
+        if self.node_evaluation == 'milp' or state.lpModel is None or self.isGoalState(state):
+            return state.status(), state.lpObjective()
+        if self.node_evaluation == 'lp':
+            return state.status(True), state.lpObjective(True)
+        metrics.count('combinatorial_checks')
+        remaining = sum(self.task_durations[task] for task in iterBits(self.full_mask & ~state.mask))
+        return 'Optimal', self.ALPHA1 * self.computeLowBound(state) + self.ALPHA2 * (sum(state.qc_completion_time) + remaining)
+
     def addObjectiveUpBound(self, state, upBound):
-        state.lpModel += self.C <= upBound
+        state.addBound(self.C, upBound=upBound)
     
     def getTaskCompletionTime(self, state):
         result = {}
@@ -461,15 +851,137 @@ class QCScheduling(SearchProblem):
                 result[task] = completed_time
         return result
     
+    def scheduleArrays(self, state):
+        # Completion time and QC of every task, NaN and -1 if unassigned, and
+        # which of all_pairs are violated. Kept on the state until its timing
+        # changes, callers must not modify them.
+        if state.arrays is None:
+            D = np.full(self.num_tasks, np.nan)
+            qc_of = np.full(self.num_tasks, -1)
+            for qc, tasks in enumerate(state.qc_assigned_tasks):
+                for task in tasks:
+                    D[task] = state.task_completion_time[task]
+                    qc_of[task] = qc
+            state.arrays = (D, qc_of, self.violatedPairs(D, qc_of))
+        return state.arrays
+
+    def countViolations(self, state):
+        return int(np.count_nonzero(self.scheduleArrays(state)[2]))
+
+    def violatedPairs(self, D, qc_of, selected=None):
+        # Which pairs of all_pairs, or of its selected indices, violate (8),
+        # (10) or (11) when every task starts as soon as its predecessor on
+        # the same QC finishes.
+        # Unassigned tasks have no completion time and never violate.
+        if selected is None:
+            pairs, (first, second) = self.all_pairs, self.pair_splits
+        else:
+            pairs = self.all_pairs[:, selected]
+            first, second = np.searchsorted(selected, self.pair_splits)
+        S = D - self.durations
+
+        # (8) Di + Pj <= Dj, that is Sj >= Di, is the last check of (10) and
+        # (11) too
+        i, j = pairs
+        violated = S[j] < D[i]
+
+        # (10) tasks i and j are not processed at the same time
+        i, j = pairs[:, first:]
+        violated[first:] &= S[i] < D[j]
+
+        # (11) QCs cannot cross: if Li < Lj but task i is done by a QC on the
+        # right of the QC doing task j, the two tasks cannot overlap
+        i, j = pairs[:, second:]
+        rank = self.qc_rank[qc_of]
+        violated[second:] &= rank[i] > rank[j]
+
+        return violated
+
     def computeLowBound(self, state):
-        remaining_tasks = set(range(self.num_tasks)).difference(state.assigned_tasks())
-        sum_ck = sum(state.qc_completion_time)
-        sum_pi = sum([self.task_durations[task] for task in remaining_tasks])
-        bm = (sum_ck + sum_pi) * 1.0 / self.num_qcs
-        return max(max(state.qc_completion_time), bm)
+        # Each bound family reduces the remaining tasks to terms (QCs, work, shared):
+        # - shared: the QCs split the work, bound (sum of their Ck + work) / |QCs|
+        # - otherwise: the work is serial and starts once one of the QCs is free,
+        #   bound min of their Ck + work
+        # Terms only depend on the remaining tasks and are memoized on them.
+        remaining = self.full_mask & ~state.mask
+        ck = state.qc_completion_time
+        bound = max(ck)
+        for name in self.low_bounds:
+            key = (name, remaining)
+            terms = self.bound_cache.get(key)
+            if terms is None:
+                terms = getattr(self, f'{name}BoundTerms')(list(iterBits(remaining)))
+                self.bound_cache.put(key, terms)
+            for qcs, work, shared in terms:
+                if not qcs:
+                    return float('inf')
+                if shared:
+                    bound = max(bound, (sum(ck[qc] for qc in qcs) + work) * 1.0 / len(qcs))
+                else:
+                    bound = max(bound, min(ck[qc] for qc in qcs) + work)
+        return bound
+
+    def workloadBoundTerms(self, tasks):
+        # Remaining workload averaged over all QCs
+        return [(tuple(range(self.num_qcs)), sum(self.task_durations[task] for task in tasks), True)]
+
+    def reachBoundTerms(self, tasks):
+        # Workload of the tasks that only a group of neighbouring QCs can reach,
+        # averaged over that group. Tasks no QC can reach make the bound infinite.
+        ordered = sorted(range(self.num_qcs), key=self.qc_locations.__getitem__)
+        terms = [((), 0, True)] if any(not self.task_reach[task] for task in tasks) else []
+        for first in range(self.num_qcs):
+            for last in range(first, self.num_qcs):
+                group = set(ordered[first:last + 1])
+                work = sum(self.task_durations[task] for task in tasks if group.issuperset(self.task_reach[task]))
+                if work > 0:
+                    terms.append((tuple(sorted(group)), work, True))
+        return terms
+
+    def precedenceBoundTerms(self, tasks):
+        # Longest chain of remaining tasks in PHI starting at each task (8)
+        remaining = set(tasks)
+        successors = {task: [j for j in self.successors[task] if j in remaining] for task in tasks}
+
+        tails = {}
+        def tail(task):
+            if task not in tails:
+                tails[task] = self.task_durations[task] + max([tail(j) for j in successors[task]], default=0)
+            return tails[task]
+
+        # Keep the longest chain per set of QCs that can start it
+        longest = {}
+        for task in tasks:
+            if successors[task]:
+                qcs = self.task_reach[task]
+                longest[qcs] = max(longest.get(qcs, 0), tail(task))
+        return [(qcs, work, False) for qcs, work in longest.items()]
+
+    def bayBoundTerms(self, tasks):
+        # Remaining tasks of a bay that are pairwise in PSI cannot overlap (10),
+        # so they are processed one after the other
+        psi = {(i, j) for i, j in zip(*self.psi_pairs.tolist())}
+        bays = {}
+        for task in tasks:
+            bays.setdefault(self.task_locations[task], []).append(task)
+
+        terms = []
+        for bay_tasks in bays.values():
+            clique = []
+            for task in sorted(bay_tasks, key=lambda task: -self.task_durations[task]):
+                if all((task, other) in psi or (other, task) in psi for other in clique):
+                    clique.append(task)
+            if len(clique) > 1:
+                qcs = tuple(sorted(set().union(*[self.task_reach[task] for task in clique])))
+                terms.append((qcs, sum(self.task_durations[task] for task in clique), False))
+        return terms
     
-    def expandGrasp(self, state, greedy=1.0):
-        actions = self.getActions(state)
+    def expandGrasp(self, state, greedy=1.0, rng=None):
+        # Tasks only become candidates once their PHI predecessors are
+        # assigned: a successor placed first leaves its predecessor no QC
+        # free early enough, while the QC of the last predecessor can always
+        # take the successor
+        actions = [(qc, task) for qc, task in self.getActions(state) if not self.predecessor_masks[task] & ~state.mask]
 
         # Step 1: select QC with the minimum completion time (Ck)
         selected_qc = None
@@ -495,10 +1007,11 @@ class QCScheduling(SearchProblem):
                 probs.append(lv)
 
         # Step 3: select with probability
+        rng = np.random if rng is None else rng
         if len(F) == 0:
             print('Warning: step 2 constructed an empty set (try change alpha)')
-            idx = np.random.choice(np.arange(len(actions)), p=[p / sum(probs) for p in weights])
+            idx = rng.choice(np.arange(len(actions)), p=[p / sum(probs) for p in weights])
             return state.result(actions[idx], self)
         else:
-            idx = np.random.choice(np.arange(len(F)), p=[p / sum(probs) for p in probs])
+            idx = rng.choice(np.arange(len(F)), p=[p / sum(probs) for p in probs])
             return state.result(F[idx], self)
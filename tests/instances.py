@@ -0,0 +1,26 @@
+from itertools import permutations, product
+from qc_scheduling import QCScheduling
+
+# Instances shared by the tests
+
+
+def five_tasks(**kwargs):
+    # Bays 1 to 5 with a QC at each end; tasks 1 and 2 cannot overlap (PSI)
+    # and task 4 precedes task 5 (PHI). Solve results are not cached.
+    kwargs.setdefault('cache_size', 0)
+    return QCScheduling(5, 2, [10, 20, 5, 15, 10], [1, 2, 3, 4, 5], [1, 5], {(1, 2)}, {(4, 5)}, **kwargs)
+
+
+def six_tasks(**kwargs):
+    # Two PSI pairs within bays 1 and 5 and a PHI chain 3 -> 4 -> 5, task 3
+    # is reached by both QCs
+    kwargs.setdefault('cache_size', 0)
+    return QCScheduling(6, 2, [10, 20, 5, 15, 10, 8], [1, 1, 3, 4, 5, 5], [1, 5], {(1, 2), (5, 6)}, {(3, 4), (4, 5)}, **kwargs)
+
+
+def complete_schedules(qcs):
+    # Every assignment of the tasks to QCs that reach them, in every order
+    for choice in product(*qcs.task_reach):
+        tasks = [[task for task, qc in enumerate(choice) if qc == k] for k in range(qcs.num_qcs)]
+        for sequences in product(*[permutations(qc_tasks) for qc_tasks in tasks]):
+            yield sequences
@@ -0,0 +1,50 @@
+import unittest
+from itertools import product
+from tests.instances import six_tasks, complete_schedules
+
+
+def prefixes(qcs):
+    seen = set()
+    for schedule in complete_schedules(qcs):
+        for cut in product(*[range(len(tasks) + 1) for tasks in schedule]):
+            prefix = tuple(tasks[:n] for tasks, n in zip(schedule, cut))
+            if prefix not in seen:
+                seen.add(prefix)
+                yield qcs.getScheduleState(prefix, False)
+
+
+class ActionTest(unittest.TestCase):
+    def test_actions_match_bay_windows(self):
+        # Every unassigned task for every QC whose window contains it, less
+        # the actions rejected by (8)
+        qcs = six_tasks()
+        for state in prefixes(qcs):
+            remaining = [task for task in range(qcs.num_tasks) if not state.mask >> task & 1]
+            expected = {(qc, task) for qc in range(qcs.num_qcs) for task in remaining
+                        if qcs.isReachable(qc, task) and not qcs.actionViolateConstraint8(state, (qc, task))}
+            actions = qcs.getActions(state)
+            self.assertEqual(len(actions), len(set(actions)))
+            self.assertEqual(set(actions), expected, state.qc_assigned_tasks)
+
+
+    def test_precedence_check_matches_full_scan(self):
+        # From a state that meets (8), an action violates it iff some PHI
+        # pair assigned after it has Di + Pj > Dj
+        qcs = six_tasks()
+        phi = list(zip(*qcs.phi_pairs.tolist()))
+        violates = lambda D: any(i in D and j in D and D[i] + qcs.task_durations[j] > D[j] for i, j in phi)
+        checked = 0
+        for state in prefixes(qcs):
+            if violates(state.task_completion_time):
+                continue
+            for qc, task in product(range(qcs.num_qcs), range(qcs.num_tasks)):
+                if state.mask >> task & 1 or not qcs.qc_reach[qc] >> task & 1:
+                    continue
+                expected = violates(state.result((qc, task), qcs).task_completion_time)
+                self.assertEqual(qcs.actionViolateConstraint8(state, (qc, task)), expected, (state.qc_assigned_tasks, qc, task))
+                checked += expected
+        self.assertGreater(checked, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
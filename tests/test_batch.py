@@ -0,0 +1,46 @@
+import json
+import os
+import tempfile
+import unittest
+from batch import SOLVERS, GRASP_SHARE, solve_instance
+
+
+class BatchTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def write_instance(self, name, data):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w') as f:
+            json.dump(data, f)
+        return path
+
+    def stats(self, name, solver):
+        with open(os.path.join(self.directory, 'output', name, f'{solver}_stats.json')) as f:
+            return json.load(f)
+
+    def test_shared_budget(self):
+        # 30 tasks, one per bay: GRASP does not finish its iterations within
+        # the budget and must leave time to branch and bound
+        n = 30
+        path = self.write_instance('vessel.json', {'durations': [10 + task % 7 for task in range(n)], 'bays': list(range(1, n + 1)), 'qcs': [1, 15, 30]})
+        time_limit = 4
+        rows = solve_instance(path, os.path.join(self.directory, 'output'), SOLVERS, time_limit, 0.4, 50)
+        self.assertEqual([row['solver'] for row in rows], list(SOLVERS))
+        self.assertFalse([row['error'] for row in rows if 'error' in row])
+        grasp = self.stats('vessel', 'grasp')
+        self.assertLess(grasp['run_time'], GRASP_SHARE * time_limit + 1)
+        self.assertGreater(grasp['values']['iterations'], 0)
+        self.assertGreater(self.stats('vessel', 'branch_and_bound')['values']['nodes'], 0)
+
+    def test_unreadable_instance(self):
+        path = self.write_instance('broken.json', {'durations': [10, 20], 'bays': [1], 'qcs': [1]})
+        rows = solve_instance(path, os.path.join(self.directory, 'output'), SOLVERS, 1, 0.4, 50)
+        self.assertEqual(len(rows), 1)
+        self.assertIn('error', rows[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,18 @@
+import unittest
+from tests.instances import five_tasks
+from beam_search import beam_search
+
+
+class BeamSearchTest(unittest.TestCase):
+    def test_gap_of_truncated_pass(self):
+        qcs = five_tasks()
+        improvements = []
+        solution, _, stats = beam_search(qcs, width=3, on_improvement=improvements.append)
+        self.assertFalse(stats['optimal'])
+        self.assertTrue(improvements)
+        # No improvement of a pass that drops children claims a zero gap
+        self.assertTrue(all(improvement.gap > 0 for improvement in improvements))
+
+
+if __name__ == '__main__':
+    unittest.main()
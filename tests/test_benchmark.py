@@ -0,0 +1,43 @@
+import unittest
+import numpy as np
+from batch import build_instance
+from benchmark import SIZE_CLASSES, SOLVERS, benchmark_instance, generate_instance
+from grasp import construct_greedy_solution
+
+
+class GeneratorTest(unittest.TestCase):
+    def test_seeded(self):
+        self.assertEqual(generate_instance('C', 1), generate_instance('C', 1))
+        self.assertNotEqual(generate_instance('C', 1), generate_instance('C', 2))
+
+    def test_size_classes(self):
+        for size_class, (num_tasks, num_qcs) in SIZE_CLASSES.items():
+            qcs = build_instance(generate_instance(size_class, 0))
+            self.assertEqual((qcs.num_tasks, qcs.num_qcs), (num_tasks, num_qcs))
+            self.assertTrue(all(qcs.task_reach), size_class)
+
+    def test_constructible(self):
+        # GRASP never gets stuck building a schedule, whatever the class
+        for size_class in SIZE_CLASSES:
+            for seed in range(3):
+                qcs = build_instance(generate_instance(size_class, seed))
+                rng = np.random.default_rng(seed)
+                for _ in range(5):
+                    self.assertIsNotNone(construct_greedy_solution(qcs, 0.4, rng), (size_class, seed))
+
+
+class BenchmarkTest(unittest.TestCase):
+    def test_every_solver_runs(self):
+        # Each solver gets its own time limit, the first one does not eat
+        # into the second one's
+        records = benchmark_instance('A0', 'A', 0, generate_instance('A', 0), SOLVERS, 1, 0.4, 10)
+        self.assertEqual([record['solver'] for record in records], list(SOLVERS))
+        for record in records:
+            self.assertGreater(record['nodes'] or record['iterations'] or 0, 0, record['solver'])
+        grasp = records[SOLVERS.index('grasp')]
+        self.assertIsNotNone(grasp['makespan'])
+        self.assertLessEqual(grasp['target'], grasp['makespan'])
+
+
+if __name__ == '__main__':
+    unittest.main()
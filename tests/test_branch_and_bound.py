@@ -0,0 +1,91 @@
+import os
+import tempfile
+import unittest
+from itertools import permutations
+from batch import build_instance
+from benchmark import generate_instance
+from branch_and_bound import branch_and_bound_dfs, branch_and_bound_parallel
+from tests.instances import five_tasks
+
+
+def exhaustive_optimum(qcs):
+    # Best MILP objective over every complete schedule
+    best = float('inf')
+    for mask in range(1 << qcs.num_tasks):
+        tasks = [[task for task in range(qcs.num_tasks) if (mask >> task & 1) == (qc == 1)] for qc in range(2)]
+        if any(qc not in qcs.task_reach[task] for qc in range(2) for task in tasks[qc]):
+            continue
+        for first in permutations(tasks[0]):
+            for second in permutations(tasks[1]):
+                state = qcs.getScheduleState((first, second))
+                if state.status() == 'Optimal':
+                    best = min(best, state.lpObjective())
+    return best
+
+
+class BranchAndBoundTest(unittest.TestCase):
+    def test_dominance_keeps_the_optimum(self):
+        optimum = exhaustive_optimum(five_tasks())
+        solution, _, stats = branch_and_bound_dfs(five_tasks())
+        self.assertGreater(stats['pruned_dominance'], 0)
+        self.assertAlmostEqual(solution.lpObjective(), optimum, places=6)
+
+    def test_parallel(self):
+        solution, _, _ = branch_and_bound_dfs(five_tasks())
+        parallel, _, stats = branch_and_bound_parallel(five_tasks(), workers=2)
+        self.assertAlmostEqual(parallel.lpObjective(), solution.lpObjective(), places=6)
+        self.assertAlmostEqual(stats['best_bound'], solution.lpObjective(), places=6)
+
+    def test_parallel_deadline(self):
+        # Node MILPs of 50 tasks take seconds, the ones still running at the
+        # deadline are not waited for
+        qcs = build_instance(generate_instance('I', 0))
+        _, run_time, _ = branch_and_bound_parallel(qcs, workers=2, deadline=0.5)
+        self.assertLess(run_time, 1.5)
+
+
+class WarmStartTest(unittest.TestCase):
+    def test_incumbent_prunes(self):
+        cold, _, cold_stats = branch_and_bound_dfs(five_tasks())
+        # The optimum, as a state or a plain schedule
+        for incumbent in (cold, [list(tasks) for tasks in cold.qc_assigned_tasks]):
+            warm, _, stats = branch_and_bound_dfs(five_tasks(), incumbent=incumbent)
+            self.assertAlmostEqual(warm.lpObjective(), cold.lpObjective(), places=6)
+            self.assertLess(stats['nodes'], cold_stats['nodes'])
+            self.assertEqual(stats['improvements'], 0)
+
+    def test_parallel_incumbent(self):
+        cold, _, _ = branch_and_bound_dfs(five_tasks())
+        warm, _, stats = branch_and_bound_parallel(five_tasks(), workers=2, incumbent=cold)
+        self.assertAlmostEqual(warm.lpObjective(), cold.lpObjective(), places=6)
+        self.assertEqual(stats['improvements'], 0)
+
+    def test_incomplete_incumbent(self):
+        with self.assertRaises(ValueError):
+            branch_and_bound_dfs(five_tasks(), incumbent=[[0, 1], [2]])
+
+
+class SpilledFringeTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.addCleanup(setattr, tempfile, 'tempdir', tempfile.tempdir)
+        tempfile.tempdir = self.directory = directory.name
+
+    def test_same_optimum(self):
+        solution, _, _ = branch_and_bound_dfs(five_tasks())
+        spilled, _, stats = branch_and_bound_dfs(five_tasks(), max_fringe=2)
+        self.assertGreater(stats['spills'], 0)
+        self.assertAlmostEqual(spilled.lpObjective(), solution.lpObjective(), places=6)
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_closed_on_error(self):
+        def fail(improvement):
+            raise RuntimeError('callback failed')
+        with self.assertRaises(RuntimeError):
+            branch_and_bound_dfs(five_tasks(), max_fringe=2, on_improvement=fail)
+        self.assertEqual(os.listdir(self.directory), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
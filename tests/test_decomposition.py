@@ -0,0 +1,23 @@
+import unittest
+from batch import build_instance
+from decomposition import decompose, partition_zones
+
+
+class DecompositionTest(unittest.TestCase):
+    def test_deadline(self):
+        # 150 tasks over 60 bays: neither the zones nor the coordination of
+        # their schedules finish within the deadline, even when the zones
+        # queue for a single worker
+        n, num_bays = 150, 60
+        qcs = build_instance({'durations': [20 + task * 37 % 380 for task in range(n)],
+                              'bays': [1 + task * num_bays // n for task in range(n)],
+                              'qcs': [1 + int(num_bays * (qc + 0.5) / 6) for qc in range(6)]})
+        self.assertEqual(len(partition_zones(qcs)), 3)
+        deadline = 2
+        _, run_time, stats = decompose(qcs, workers=1, deadline=deadline, zone_deadline=10 * deadline, seed=0)
+        self.assertLess(run_time, deadline + 1)
+        self.assertLess(stats.timers['zones'], deadline)
+
+
+if __name__ == '__main__':
+    unittest.main()
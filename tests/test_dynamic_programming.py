@@ -0,0 +1,45 @@
+import unittest
+from qc_scheduling import QCScheduling
+from dynamic_programming import dynamic_programming, crossings_possible
+from branch_and_bound import branch_and_bound_dfs
+
+
+def makespan(qcs, solution):
+    # C of the MILP optimum, its objective also counts the QC workloads
+    return round((solution.lpObjective() - qcs.ALPHA2 * sum(qcs.task_durations)) / qcs.ALPHA1, 6)
+
+
+class DynamicProgrammingTest(unittest.TestCase):
+    def compare(self, *args):
+        qcs = QCScheduling(*args, set(), set(), cache_size=0)
+        solution, _, stats = dynamic_programming(qcs, deadline=60)
+        bb_solution, _, _ = branch_and_bound_dfs(qcs, deadline=60)
+        self.assertLessEqual(makespan(qcs, bb_solution), stats['objective'])
+        if stats['optimal']:
+            self.assertEqual(solution.objective(), makespan(qcs, bb_solution))
+        return qcs, stats
+
+    def test_without_crossings(self):
+        qcs, stats = self.compare(4, 2, [12, 25, 8, 33], [1, 2, 3, 4], [1, 3])
+        self.assertFalse(crossings_possible(qcs))
+        self.assertTrue(stats['optimal'])
+
+    def test_no_time_left(self):
+        # The greedy assignment comes back, not claimed optimal
+        qcs = QCScheduling(4, 2, [12, 25, 8, 33], [1, 2, 3, 4], [1, 3], set(), set(), cache_size=0)
+        solution, _, stats = dynamic_programming(qcs, deadline=0)
+        self.assertFalse(stats['optimal'])
+        self.assertIsNotNone(solution)
+        self.assertLessEqual(stats['best_bound'], stats['objective'])
+
+    def test_crossing_needs_waiting(self):
+        # The MILP optimum (30) waits for a crossing to clear, the best
+        # no-wait schedule takes 33 and is not reported optimal
+        qcs, stats = self.compare(5, 3, [6, 13, 21, 20, 17], [2, 3, 3, 4, 5], [2, 4, 5])
+        self.assertTrue(crossings_possible(qcs))
+        self.assertFalse(stats['optimal'])
+        self.assertEqual(stats['objective'], 33)
+
+
+if __name__ == '__main__':
+    unittest.main()
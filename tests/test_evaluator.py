@@ -0,0 +1,73 @@
+import unittest
+from qc_scheduling import QCScheduling
+from grasp import relocate_moves, exchange_moves, reverse_moves
+
+
+class EvaluatorTest(unittest.TestCase):
+    def setUp(self):
+        # Tasks 1 and 2 (PSI) cannot overlap, task 3 follows task 4 (PHI)
+        self.qcs = QCScheduling(4, 2, [5, 20, 5, 5], [1, 4, 1, 4], [1, 4], {(1, 2)}, {(4, 3)})
+
+    def test_completion_times(self):
+        state = self.qcs.getScheduleState(((0, 2), (3, 1)), False)
+        state.evaluate(self.qcs)
+        self.assertEqual(state.qc_completion_time, [10, 25])
+        self.assertEqual(state.task_completion_time, {0: 5, 2: 10, 3: 5, 1: 25})
+        self.assertEqual(state.objective(), 25)
+
+    def test_feasible_schedule(self):
+        state = self.qcs.getScheduleState(((0, 2), (3, 1)), False)
+        self.assertTrue(state.evaluate(self.qcs))
+        self.assertEqual(self.qcs.countViolations(state), 0)
+
+    def test_psi_overlap(self):
+        # Tasks 1 and 2 both run from time 0
+        state = self.qcs.getScheduleState(((0, 2), (1, 3)), False)
+        self.assertFalse(state.evaluate(self.qcs))
+
+    def test_phi_order(self):
+        # Task 3 ends before task 4 does
+        state = self.qcs.getScheduleState(((2, 0), (3, 1)), False)
+        self.assertFalse(state.evaluate(self.qcs))
+
+    def test_qc_order(self):
+        # The same instance with the QCs numbered right to left
+        mirrored = QCScheduling(4, 2, [5, 20, 5, 5], [1, 4, 1, 4], [4, 1], {(1, 2)}, {(4, 3)})
+        for schedule in (((0, 2), (3, 1)), ((3, 1), (0, 2)), ((0, 3), (2, 1)), ((1, 2), (0, 3))):
+            state = self.qcs.getScheduleState(schedule, False)
+            state.evaluate(self.qcs)
+            mirrored_state = mirrored.getScheduleState(schedule[::-1], False)
+            mirrored_state.evaluate(mirrored)
+            self.assertEqual(mirrored.countViolations(mirrored_state), self.qcs.countViolations(state), schedule)
+
+    def test_move_deltas(self):
+        # The incremental deltas of every VND move match a full recount,
+        # re-checking all pairs or only the ones involving a changed task
+        for share in (0, 1):
+            self.qcs.INCIDENT_SHARE = share
+            for schedule in (((0, 2), (3, 1)), ((2, 0), (1, 3)), ((0, 1, 2), (3,))):
+                state = self.qcs.getScheduleState(schedule, False)
+                state.evaluate(self.qcs)
+                violations = self.qcs.countViolations(state)
+                for neighborhood in (relocate_moves, exchange_moves, reverse_moves):
+                    for _, moves in neighborhood(state, self.qcs, (0, 0)):
+                        for move in moves:
+                            delta_makespan, delta_violations = state.evaluateMove(self.qcs, move)
+                            new_state = state.applyMove(self.qcs, move)
+                            self.assertEqual(delta_makespan, new_state.objective() - state.objective(), move)
+                            self.assertEqual(delta_violations, self.qcs.countViolations(new_state) - violations, move)
+
+    def test_cached_arrays(self):
+        # A state's arrays follow its timing, clones share them until then
+        state = self.qcs.getScheduleState(((0, 2), (3, 1)), False)
+        state.evaluate(self.qcs)
+        arrays = self.qcs.scheduleArrays(state)
+        self.assertIs(self.qcs.scheduleArrays(state.clone()), arrays)
+        # Tasks 1 and 2 now overlap and task 3 ends before task 4 does
+        moved = state.applyMove(self.qcs, {1: (1, 3)})
+        self.assertIsNot(self.qcs.scheduleArrays(moved), arrays)
+        self.assertEqual(self.qcs.countViolations(moved), 2)
+        self.assertEqual(self.qcs.countViolations(state), 0)
+
+if __name__ == '__main__':
+    unittest.main()
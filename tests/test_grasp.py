@@ -0,0 +1,54 @@
+import random
+import unittest
+import numpy as np
+from qc_scheduling import QCScheduling
+from grasp import launch, launch_parallel, local_search, variable_neighborhood_descent
+
+
+class VNDTest(unittest.TestCase):
+    def setUp(self):
+        # Both QCs reach both tasks, which cannot overlap (PSI)
+        self.qcs = QCScheduling(2, 2, [10, 10], [3, 3], [2, 3], {(1, 2)}, {})
+
+    def test_relocation_keeps_every_qc_busy(self):
+        state = self.qcs.getScheduleState(((0,), (1,)), False)
+        state.evaluate(self.qcs)
+        sol = variable_neighborhood_descent(state, self.qcs)
+        self.assertTrue(all(sol.qc_assigned_tasks))
+
+    def test_no_time_left(self):
+        # The improvement stops at once and keeps the solution as it is
+        state = self.qcs.getScheduleState(((), (0, 1)), False)
+        state.evaluate(self.qcs)
+        self.assertIs(variable_neighborhood_descent(state, self.qcs, deadline=0), state)
+        self.assertIs(local_search(state, 10, self.qcs, deadline=0), state)
+
+    def test_launch(self):
+        random.seed(0)
+        np.random.seed(0)
+        solution, _, stats = launch(self.qcs, 0.4, 10, vnd=True, deadline=5, max_iterations=20)
+        self.assertEqual(stats['iterations'], 20)
+        if solution is not None:
+            self.assertEqual(self.qcs.countViolations(solution), 0)
+
+    def test_empty_qc_model(self):
+        state = self.qcs.getScheduleState(((), (0, 1)), False)
+        state.evaluateGrasp(self.qcs)
+        self.assertEqual(state.qc_completion_time, [0, 20])
+        self.assertEqual(state.status(), 'Optimal')
+
+
+class ParallelTest(unittest.TestCase):
+    def test_reproducible_with_patience(self):
+        qcs = QCScheduling(8, 2, [10, 20, 5, 15, 10, 25, 5, 10], [1, 2, 3, 4, 5, 6, 7, 8], [2, 7], {(1, 2)}, {(6, 7)}, cache_size=0)
+        runs = []
+        for _ in range(2):
+            solution, _, stats = launch_parallel(qcs, 0.4, 5, workers=2, seed=7, patience=3, deadline=60)
+            runs.append((solution.qc_assigned_tasks, stats['iterations']))
+        self.assertEqual(runs[0], runs[1])
+        # Patience stopped the workers long before MAX_ITERATION
+        self.assertLess(runs[0][1], 100)
+
+
+if __name__ == '__main__':
+    unittest.main()
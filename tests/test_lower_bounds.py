@@ -0,0 +1,50 @@
+import unittest
+from itertools import product
+from tests.instances import six_tasks, complete_schedules
+
+FAMILIES = ('workload', 'reach', 'precedence', 'bay')
+
+
+def instance(low_bounds=FAMILIES):
+    return six_tasks(low_bounds=low_bounds)
+
+
+class LowerBoundTest(unittest.TestCase):
+    def test_bounds_never_exceed_a_completion(self):
+        # A prefix of every QC sequence bounds the makespan of every
+        # feasible schedule extending it
+        qcs = instance()
+        checked = 0
+        for schedule in complete_schedules(qcs):
+            state = qcs.getScheduleState(schedule, False)
+            if not state.evaluate(qcs):
+                continue
+            for cut in product(*[range(len(tasks) + 1) for tasks in schedule]):
+                prefix = qcs.getScheduleState([tasks[:n] for tasks, n in zip(schedule, cut)], False)
+                self.assertLessEqual(qcs.computeLowBound(prefix), state.objective(), (schedule, cut))
+                checked += 1
+        self.assertGreater(checked, 0)
+
+    def test_families_tighten_the_bound(self):
+        workload, combined = instance(('workload',)), instance()
+        tighter = 0
+        for schedule in complete_schedules(combined):
+            for cut in product(*[range(len(tasks) + 1) for tasks in schedule]):
+                prefix = [tasks[:n] for tasks, n in zip(schedule, cut)]
+                bound = combined.computeLowBound(combined.getScheduleState(prefix, False))
+                base = workload.computeLowBound(workload.getScheduleState(prefix, False))
+                self.assertGreaterEqual(bound, base)
+                tighter += bound > base
+        self.assertGreater(tighter, 0)
+
+    def test_bound_cache_is_bounded(self):
+        qcs = instance()
+        qcs.bound_cache.maxsize = 4
+        for schedule in complete_schedules(qcs):
+            for qc in range(qcs.num_qcs):
+                qcs.computeLowBound(qcs.getScheduleState([tasks[:1] if k == qc else () for k, tasks in enumerate(schedule)], False))
+        self.assertLessEqual(len(qcs.bound_cache), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
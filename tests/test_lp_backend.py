@@ -0,0 +1,33 @@
+import unittest
+import lp_backend
+from branch_and_bound import branch_and_bound_dfs
+from tests.instances import five_tasks
+
+
+@unittest.skipIf(lp_backend.highspy is None, 'highspy is not installed')
+class HiGHSTest(unittest.TestCase):
+    def test_same_node_objectives(self):
+        # One model per instance, re-solved with the bounds of every node
+        highs, cbc = five_tasks(solver='highs'), five_tasks(solver='cbc')
+        for schedule in (((), ()), ((0,), (3, 4)), ((0, 1), (4,)), ((0, 1), (3, 4, 2))):
+            highs_node, cbc_node = highs.getScheduleState(schedule), cbc.getScheduleState(schedule)
+            self.assertEqual(highs_node.status(), cbc_node.status(), schedule)
+            self.assertAlmostEqual(highs_node.lpObjective(), cbc_node.lpObjective(), places=6, msg=schedule)
+            self.assertAlmostEqual(highs_node.lpObjective(True), cbc_node.lpObjective(True), places=6, msg=schedule)
+
+    def test_bounds_reset(self):
+        # A node solved after a deeper one only keeps its own bounds
+        highs, cbc = five_tasks(solver='highs'), five_tasks(solver='cbc')
+        for schedule in (((0, 1), (3, 4, 2)), ((0,), (4,)), ((), ()), ((1, 0), (2, 3, 4)), ((0,), (4,))):
+            highs_node, cbc_node = highs.getScheduleState(schedule), cbc.getScheduleState(schedule)
+            self.assertEqual(highs_node.status(), cbc_node.status(), schedule)
+            self.assertAlmostEqual(highs_node.lpObjective(), cbc_node.lpObjective(), places=6, msg=schedule)
+
+    def test_same_optimum(self):
+        highs_solution, _, _ = branch_and_bound_dfs(five_tasks(solver='highs'), deadline=60)
+        cbc_solution, _, _ = branch_and_bound_dfs(five_tasks(solver='cbc'), deadline=60)
+        self.assertAlmostEqual(highs_solution.lpObjective(), cbc_solution.lpObjective(), places=6)
+
+
+if __name__ == '__main__':
+    unittest.main()
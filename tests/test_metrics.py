@@ -0,0 +1,75 @@
+import json
+import os
+import tempfile
+import unittest
+import metrics
+from branch_and_bound import branch_and_bound_dfs
+from tests.instances import five_tasks
+
+
+class SolverStatsTest(unittest.TestCase):
+    def test_collecting(self):
+        stats = metrics.SolverStats('test')
+        metrics.count('ignored')
+        with metrics.collecting(stats):
+            metrics.count('states', 2)
+            metrics.gauge('fringe', 3)
+            metrics.gauge('fringe', 1)
+            with metrics.timed('lp_solve'):
+                pass
+        metrics.count('ignored')
+        self.assertEqual(stats['states'], 2)
+        self.assertEqual(stats['lp_solve'], 1)
+        self.assertEqual(stats.gauges['fringe'], (1, 3))
+        self.assertNotIn('ignored', stats.counters)
+
+    def test_merge(self):
+        stats, worker = metrics.SolverStats('master', True), metrics.SolverStats('worker', True)
+        for collected in (stats, worker):
+            collected.count('nodes')
+            collected.addTime('lp_solve', 0.5)
+            collected.gauge('fringe', len(collected.name))
+        stats.merge(worker)
+        self.assertEqual(stats['nodes'], 2)
+        self.assertEqual(stats['lp_solve'], 2)
+        self.assertEqual(stats.timers['lp_solve'], 1.0)
+        self.assertEqual(stats.gauges['fringe'], (6, 6))
+        self.assertEqual(len(stats.events), 4)
+
+    def test_json(self):
+        _, _, stats = branch_and_bound_dfs(five_tasks())
+        data = json.loads(stats.toJSON())
+        self.assertEqual(data['name'], 'branch_and_bound')
+        self.assertEqual(data['values']['nodes'], stats['nodes'])
+        self.assertEqual(data['timers']['lp_solve']['calls'], stats['lp_solve'])
+        self.assertGreater(data['gauges']['fringe']['peak'], 0)
+        self.assertIsNotNone(data['run_time'])
+
+
+class ChromeTraceTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'trace.json')
+
+    def test_trace(self):
+        stats = metrics.SolverStats('branch_and_bound', trace=True)
+        branch_and_bound_dfs(five_tasks(), stats=stats)
+        stats.writeChromeTrace(self.path)
+        with open(self.path) as f:
+            events = json.load(f)['traceEvents']
+        # One complete event per timed section, one counter event per gauge change
+        sections = [event for event in events if event['ph'] == 'X']
+        self.assertEqual(sum(1 for event in sections if event['name'] == 'lp_solve'), stats['lp_solve'])
+        self.assertTrue(all(event['dur'] >= 0 for event in sections))
+        self.assertTrue(any(event['ph'] == 'C' and event['name'] == 'fringe' for event in events))
+
+    def test_without_trace(self):
+        _, _, stats = branch_and_bound_dfs(five_tasks())
+        with self.assertRaises(ValueError):
+            stats.writeChromeTrace(self.path)
+        self.assertFalse(os.path.exists(self.path))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+from lp_backend import make_solver
+from tests.instances import five_tasks
+
+
+def pulp_instance():
+    # The same instance on the model built constraint by constraint
+    qcs = five_tasks(solver='cbc')
+    qcs.lpModel = qcs.initModel()
+    qcs.lpModel.solver = make_solver('cbc')
+    qcs.lpModel.relaxed_solver = make_solver('cbc', mip=False)
+    qcs.lpModel.solve_cache = qcs.solve_cache
+    return qcs
+
+
+class ModelTest(unittest.TestCase):
+    def assertSameOptimum(self, schedule):
+        node = five_tasks(solver='cbc').getScheduleState(schedule)
+        pulp_node = pulp_instance().getScheduleState(schedule)
+        self.assertEqual(node.status(), 'Optimal')
+        self.assertEqual(pulp_node.status(), 'Optimal')
+        self.assertAlmostEqual(node.lpObjective(), pulp_node.lpObjective(), places=6)
+
+    def test_partial_schedule(self):
+        self.assertSameOptimum(((0,), (3, 4)))
+
+    def test_complete_schedule(self):
+        self.assertSameOptimum(((0, 1), (3, 4, 2)))
+
+
+
+class SharedModelTest(unittest.TestCase):
+    def test_bounds_are_restored(self):
+        qcs = five_tasks()
+        model = qcs.getModel()
+        before = [(v.name, v.lowBound, v.upBound) for v in model.variables()]
+        node = qcs.getScheduleState(((0, 1), (3, 4, 2)))
+        self.assertIs(node.lpModel, model)
+        node.status()
+        self.assertEqual([(v.name, v.lowBound, v.upBound) for v in model.variables()], before)
+
+    def test_nodes_are_independent(self):
+        # Results do not depend on the nodes solved before on the model
+        schedules = (((0,), (3, 4)), ((0, 1), (3, 4, 2)), ((0, 1, 2), (3, 4)))
+        fresh = []
+        for schedule in schedules:
+            node = five_tasks().getScheduleState(schedule)
+            fresh.append((node.status(), node.lpObjective()))
+        qcs = five_tasks()
+        shared = []
+        for schedule in schedules[::-1]:
+            node = qcs.getScheduleState(schedule)
+            shared.append((node.status(), node.lpObjective()))
+        self.assertEqual(shared[::-1], fresh)
+
+
+if __name__ == '__main__':
+    unittest.main()
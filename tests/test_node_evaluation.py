@@ -0,0 +1,19 @@
+import unittest
+from qc_scheduling import QCScheduling
+from branch_and_bound import branch_and_bound_dfs
+
+
+class NodeEvaluationTest(unittest.TestCase):
+    def test_same_optimum(self):
+        # The optimum ((1, 3), (2, 4)) has QC 2 wait for QC 1, without
+        # waiting tasks 1 and 2 would overlap (PSI)
+        for node_evaluation in QCScheduling.NODE_EVALUATIONS:
+            qcs = QCScheduling(4, 2, [10, 10, 10, 10], [1, 4, 1, 4], [1, 4], {(1, 2), (1, 4), (3, 2), (3, 4)}, {},
+                               cache_size=0, node_evaluation=node_evaluation)
+            solution, _, _ = branch_and_bound_dfs(qcs, deadline=60)
+            self.assertIsNotNone(solution, node_evaluation)
+            self.assertAlmostEqual(solution.lpObjective(), 20.4, places=6, msg=node_evaluation)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,41 @@
+import unittest
+from online import OnlineScheduler
+
+
+class OnlineSchedulerTest(unittest.TestCase):
+    def setUp(self):
+        # Nine bays, QC 1 alone reaches bay 5
+        self.scheduler = OnlineScheduler({task: 10 for task in range(1, 10)}, {task: task for task in range(1, 10)}, [2, 5, 8])
+
+    def test_unavailable_qc(self):
+        self.scheduler.setUnavailable(1)
+        qcs, ids, index = self.scheduler.buildInstance()
+        self.assertEqual(qcs.qc_reach[1], 0)
+        # The task only QC 1 reached goes to its neighbours
+        self.assertEqual(qcs.task_reach[index[5]], (0, 2))
+        self.assertEqual(qcs.task_reach[index[4]], (0,))
+        plan, _, _ = self.scheduler.replan(deadline=1, seed=0)
+        self.assertEqual(plan[1], [])
+        self.assertEqual(sorted(plan[0] + plan[2]), list(range(1, 10)))
+
+    def test_unavailable_outermost_qc(self):
+        self.scheduler.setUnavailable(2)
+        qcs, ids, index = self.scheduler.buildInstance()
+        self.assertEqual(qcs.task_reach[index[9]], (1,))
+
+    def test_change_duration(self):
+        self.scheduler.changeDuration(5, 40)
+        qcs, ids, index = self.scheduler.buildInstance()
+        self.assertEqual(qcs.task_durations[index[5]], 40)
+        plan, _, _ = self.scheduler.replan(deadline=1, seed=0)
+        self.assertIsNotNone(plan)
+        self.assertGreaterEqual(self.scheduler.makespan, 40)
+
+    def test_change_duration_of_unknown_task(self):
+        with self.assertRaises(ValueError):
+            self.scheduler.changeDuration(10, 40)
+        self.assertNotIn(10, self.scheduler.durations)
+
+
+if __name__ == '__main__':
+    unittest.main()
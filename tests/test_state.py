@@ -0,0 +1,42 @@
+import unittest
+from tests.instances import five_tasks
+
+
+class StateTest(unittest.TestCase):
+    def setUp(self):
+        self.qcs = five_tasks()
+
+    def test_equal_schedules_hash_equal(self):
+        # Reached in different orders, the QC sequences are the same
+        a = self.qcs.getScheduleState(((0, 1), (3,)), False)
+        b = self.qcs.getStartState(False)
+        for action in ((1, 3), (0, 0), (0, 1)):
+            b = b.result(action, self.qcs)
+        self.assertEqual(a, b)
+        self.assertEqual(hash(a), hash(b))
+        self.assertEqual(len({a, b}), 1)
+        self.assertEqual(a.mask, 0b1011)
+
+    def test_different_schedules(self):
+        a = self.qcs.getScheduleState(((0, 1), (3,)), False)
+        b = self.qcs.getScheduleState(((1, 0), (3,)), False)
+        self.assertNotEqual(a, b)
+        self.assertEqual(a.mask, b.mask)
+
+    def test_result_leaves_parent_unchanged(self):
+        parent = self.qcs.getScheduleState(((0,), (3,)), False)
+        child = parent.result((0, 1), self.qcs)
+        self.assertEqual(parent.qc_assigned_tasks, ((0,), (3,)))
+        self.assertEqual(parent.qc_completion_time, [10, 15])
+        self.assertEqual(parent.task_completion_time, {0: 10, 3: 15})
+        self.assertEqual(child.qc_completion_time, [30, 15])
+        self.assertEqual(child.task_completion_time, {0: 10, 3: 15, 1: 30})
+
+    def test_no_instance_dict(self):
+        state = self.qcs.getStartState(False)
+        with self.assertRaises(AttributeError):
+            state.extra = 1
+
+
+if __name__ == '__main__':
+    unittest.main()
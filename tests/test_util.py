@@ -0,0 +1,104 @@
+import os
+import unittest
+import util
+
+
+class DominanceTableTest(unittest.TestCase):
+    def test_dominated_insert_fails(self):
+        table = util.DominanceTable()
+        self.assertTrue(table.insert(1, (5, 5)))
+        self.assertFalse(table.insert(1, (5, 6)))
+        self.assertFalse(table.insert(1, (5, 5)))
+        self.assertFalse(table.contains(1, (5, 6)))
+
+    def test_incomparable_vectors_are_kept(self):
+        table = util.DominanceTable()
+        self.assertTrue(table.insert(1, (3, 7)))
+        self.assertTrue(table.insert(1, (7, 3)))
+        self.assertTrue(table.contains(1, (3, 7)))
+        self.assertTrue(table.contains(1, (7, 3)))
+        self.assertEqual(len(table), 2)
+
+    def test_dominating_insert_prunes(self):
+        table = util.DominanceTable()
+        table.insert(1, (3, 7))
+        table.insert(1, (7, 3))
+        table.insert(1, (8, 1))
+        self.assertTrue(table.insert(1, (3, 3)))
+        self.assertFalse(table.contains(1, (3, 7)))
+        self.assertFalse(table.contains(1, (7, 3)))
+        self.assertTrue(table.contains(1, (8, 1)))
+        self.assertEqual(len(table), 2)
+
+    def test_keys_are_independent(self):
+        table = util.DominanceTable()
+        table.insert(1, (1, 1))
+        self.assertTrue(table.insert(2, (5, 5)))
+        self.assertTrue(table.contains(2, (5, 5)))
+
+
+class LRUCacheTest(unittest.TestCase):
+    def test_least_recently_used_is_evicted(self):
+        cache = util.LRUCache(2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        self.assertEqual(cache.get('a'), 1)
+        cache.put('c', 3)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.get('c'), 3)
+        self.assertEqual(len(cache), 2)
+
+    def test_update_refreshes_entry(self):
+        cache = util.LRUCache(2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        cache.put('a', 10)
+        cache.put('c', 3)
+        self.assertEqual(cache.get('a'), 10)
+        self.assertIsNone(cache.get('b'))
+
+    def test_hit_rate(self):
+        cache = util.LRUCache(2)
+        cache.put('a', 1)
+        cache.get('a')
+        cache.get('b')
+        self.assertEqual(cache.stats(), {'size': 1, 'maxsize': 2, 'hits': 1, 'misses': 1, 'hit_rate': 0.5})
+
+    def test_disabled(self):
+        cache = util.LRUCache(0)
+        cache.put('a', 1)
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(len(cache), 0)
+
+
+class DiskBackedPriorityQueueTest(unittest.TestCase):
+    def test_order_across_spills(self):
+        priorities = [(7 * i) % 20 for i in range(20)] + [3, 3, 15]
+        with util.DiskBackedPriorityQueue(4) as queue:
+            for i, priority in enumerate(priorities):
+                queue.push(i, priority)
+            self.assertGreater(queue.spills, 0)
+            self.assertEqual(len(queue), len(priorities))
+            self.assertEqual(queue.peekPriority(), 0)
+
+            popped = []
+            while not queue.isEmpty():
+                popped.append(queue.pop())
+                if len(popped) == 5:
+                    # Pushed between loads of spilled entries
+                    queue.push('late', 2.5)
+        expected = [i for _, i in sorted((priority, i) for i, priority in enumerate(priorities))]
+        self.assertEqual(popped, expected[:5] + ['late'] + expected[5:])
+
+    def test_temporary_file_is_removed(self):
+        with util.DiskBackedPriorityQueue(2) as queue:
+            for i in range(5):
+                queue.push(i, i)
+            path = queue.path
+            self.assertTrue(os.path.exists(path))
+        self.assertFalse(os.path.exists(path))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,11 @@
 import sys
+import os
 import inspect
 import heapq
+import pickle
+import sqlite3
+import tempfile
+from collections import namedtuple, OrderedDict
 
 class Stack:
     def __init__(self):
@@ -15,6 +20,9 @@ class Stack:
     def isEmpty(self):
         return len(self.list) == 0
 
+    def __len__(self):
+        return len(self.list)
+
 class PriorityQueue:
     """
       Implements a priority queue data structure. Each inserted item
@@ -38,6 +46,13 @@ class PriorityQueue:
     def isEmpty(self):
         return len(self.heap) == 0
 
+    def __len__(self):
+        return len(self.heap)
+
+    def peekPriority(self):
+        # Priority of the item pop would return
+        return self.heap[0][0]
+
     def update(self, item, priority):
         # If item already in priority queue with higher priority, update its priority and rebuild the heap.
         # If item already in priority queue with equal or lower priority, do nothing.
@@ -53,6 +68,181 @@ class PriorityQueue:
         else:
             self.push(item, priority)
 
+class DiskBackedPriorityQueue(PriorityQueue):
+    """
+      Priority queue that keeps at most max_items items in memory. Past
+      that, the half with the highest priorities is spilled to an SQLite
+      table at path (a temporary file by default) and read back in
+      priority order once the lowest spilled priority comes first.
+      encode and decode convert an item to and from a str or bytes;
+      priorities must be numbers. Used as a context manager, the queue is
+      closed on exit.
+    """
+    def __init__(self, max_items, path=None, encode=pickle.dumps, decode=pickle.loads):
+        super().__init__()
+        self.max_items = max(2, max_items)
+        self.path = path
+        self.encode = encode
+        self.decode = decode
+        self.db = None
+        self.temporary = False
+        self.spilled = 0
+        # (priority, count) of the first spilled entry
+        self.spilled_first = (float('inf'), 0)
+        self.spills = 0
+
+    def connect(self):
+        if self.db is None:
+            if self.path is None:
+                fd, self.path = tempfile.mkstemp(suffix='.sqlite')
+                os.close(fd)
+                self.temporary = True
+            self.db = sqlite3.connect(self.path)
+            self.db.execute('CREATE TABLE IF NOT EXISTS fringe (priority REAL, count INTEGER, item BLOB)')
+            self.db.execute('CREATE INDEX IF NOT EXISTS fringe_order ON fringe (priority, count)')
+        return self.db
+
+    def push(self, item, priority):
+        super().push(item, priority)
+        if len(self.heap) > self.max_items:
+            self.spill()
+
+    def pop(self):
+        if self.spilled and (not self.heap or self.spilled_first < self.heap[0][:2]):
+            self.load()
+        return super().pop()
+
+    def spill(self):
+        # A sorted list is a heap, its tail holds the highest priorities
+        self.heap.sort()
+        keep = self.max_items // 2
+        entries = self.heap[keep:]
+        del self.heap[keep:]
+        self.connect().executemany('INSERT INTO fringe VALUES (?, ?, ?)',
+                                   [(priority, count, self.encode(item)) for priority, count, item in entries])
+        self.db.commit()
+        self.spilled += len(entries)
+        self.spilled_first = min(self.spilled_first, entries[0][:2])
+        self.spills += 1
+
+    def load(self):
+        # Moves the lowest spilled entries back to memory
+        rows = self.db.execute('SELECT rowid, priority, count, item FROM fringe ORDER BY priority, count LIMIT ?',
+                               (self.max_items // 2,)).fetchall()
+        self.db.executemany('DELETE FROM fringe WHERE rowid = ?', [(rowid,) for rowid, _, _, _ in rows])
+        self.db.commit()
+        for _, priority, count, item in rows:
+            heapq.heappush(self.heap, (priority, count, self.decode(item)))
+        self.spilled -= len(rows)
+        row = self.db.execute('SELECT priority, count FROM fringe ORDER BY priority, count LIMIT 1').fetchone()
+        self.spilled_first = (float('inf'), 0) if row is None else row
+
+    def isEmpty(self):
+        return not self.heap and not self.spilled
+
+    def __len__(self):
+        return len(self.heap) + self.spilled
+
+    def peekPriority(self):
+        if not self.heap:
+            return self.spilled_first[0]
+        return min(self.heap[0][0], self.spilled_first[0])
+
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+            self.db = None
+            if self.temporary:
+                os.remove(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+class DominanceTable:
+    """
+      Keeps, for each key, the Pareto set of the cost vectors inserted so
+      far (lower is better on every component). Inserting a vector that is
+      dominated by or equal to a stored one fails; otherwise the vector is
+      stored and the ones it dominates are dropped.
+    """
+    def __init__(self):
+        self.table = {}
+
+    def insert(self, key, vector):
+        vector = tuple(vector)
+        vectors = self.table.setdefault(key, [])
+        for other in vectors:
+            if all(a <= b for a, b in zip(other, vector)):
+                return False
+        vectors[:] = [other for other in vectors if not all(a <= b for a, b in zip(vector, other))]
+        vectors.append(vector)
+        return True
+
+    def contains(self, key, vector):
+        # False once vector has been dropped by a dominating insertion
+        return tuple(vector) in self.table.get(key, ())
+
+    def __len__(self):
+        return sum(len(vectors) for vectors in self.table.values())
+
+class LRUCache:
+    """
+      Mapping of bounded size that evicts the least recently used entry.
+      Lookups are counted to report the hit rate. A maxsize of 0 disables
+      the cache.
+    """
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key]
+        self.misses += 1
+        return default
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def hitRate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self):
+        return {'size': len(self), 'maxsize': self.maxsize, 'hits': self.hits, 'misses': self.misses, 'hit_rate': self.hitRate()}
+
+# Passed to the on_improvement callbacks of the solvers: the schedule as
+# one task tuple per QC, its objective, the seconds since the solver started
+# and the relative gap to the best known lower bound
+Improvement = namedtuple('Improvement', ['schedule', 'objective', 'elapsed', 'gap'])
+
+def relativeGap(objective, bound):
+    if objective == 0:
+        return 0.0
+    return max(0.0, (objective - bound) / abs(objective))
+
+def iterBits(mask):
+    # Indices of the set bits of mask, lowest first
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
 def raiseNotDefined():
     fileName = inspect.stack()[1][1]
     line = inspect.stack()[1][2]